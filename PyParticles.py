@@ -1,4 +1,13 @@
-import math, random
+import math, random, time
+import heapq
+import weakref
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def addVectors((angle1, length1), (angle2, length2)):
@@ -13,6 +22,18 @@ def addVectors((angle1, length1), (angle2, length2)):
     return (angle, length)
 
 
+def addVectorArrays(angle1, length1, angle2, length2):
+    """ addVectors for arrays of vectors, returns arrays of angles and lengths """
+
+    x = np.sin(angle1) * length1 + np.sin(angle2) * length2
+    y = np.cos(angle1) * length1 + np.cos(angle2) * length2
+
+    angle = 0.5 * math.pi - np.arctan2(y, x)
+    length = np.hypot(x, y)
+
+    return (angle, length)
+
+
 def collide(p1, p2):
     """ Tests whether two particles overlap
         If they do, make them bounce
@@ -41,6 +62,44 @@ def collide(p1, p2):
         p2.y += math.cos(angle) * overlap
 
 
+def collideCartesian(p1, p2):
+    """ collide for CartesianParticles, without the trigonometry """
+
+    dx = p1.x - p2.x
+    dy = p1.y - p2.y
+
+    dist = math.hypot(dx, dy)
+    if dist < p1.size + p2.size:
+        # unit vector along the line between the centres, from p2 to p1,
+        # or along +x for particles on the same spot, as atan2(0, 0) gives collide
+        if dist == 0:
+            (nx, ny) = (1.0, 0.0)
+        else:
+            nx = dx / dist
+            ny = dy / dist
+        total_mass = p1.mass + p2.mass
+
+        speed2 = math.hypot(p2.vx, p2.vy)
+        push = 2 * speed2 * p2.mass / total_mass
+        p1.vx = p1.vx * (p1.mass - p2.mass) / total_mass + nx * push
+        p1.vy = p1.vy * (p1.mass - p2.mass) / total_mass + ny * push
+        # as in collide, p2 is pushed by p1's new speed
+        push = 2 * math.hypot(p1.vx, p1.vy) * p1.mass / total_mass
+        p2.vx = p2.vx * (p2.mass - p1.mass) / total_mass - nx * push
+        p2.vy = p2.vy * (p2.mass - p1.mass) / total_mass - ny * push
+        elasticity = p1.elasticity * p2.elasticity
+        p1.vx *= elasticity
+        p1.vy *= elasticity
+        p2.vx *= elasticity
+        p2.vy *= elasticity
+
+        overlap = 0.5 * (p1.size + p2.size - dist + 1)
+        p1.x += nx * overlap
+        p1.y += ny * overlap
+        p2.x -= nx * overlap
+        p2.y -= ny * overlap
+
+
 class Particle:
     """ A circular object with a velocity, size and mass """
 
@@ -89,6 +148,374 @@ class Particle:
         self.speed = math.hypot(dx, dy) * 0.1
 
 
+class CartesianParticle(Particle, object):
+    """ A Particle that keeps its velocity as x and y components, vx and vy,
+        so moving and accelerating it takes no trigonometry. angle and speed
+        are worked out from them when asked for. """
+
+    def __init__(self, position, size, mass=1):
+        self.vx = 0
+        self.vy = 0
+        Particle.__init__(self, position, size, mass)
+
+    @property
+    def speed(self):
+        return math.hypot(self.vx, self.vy)
+
+    @speed.setter
+    def speed(self, speed):
+        angle = self.angle
+        self.vx = math.sin(angle) * speed
+        self.vy = -math.cos(angle) * speed
+
+    @property
+    def angle(self):
+        return math.atan2(self.vx, -self.vy)
+
+    @angle.setter
+    def angle(self, angle):
+        speed = self.speed
+        self.vx = math.sin(angle) * speed
+        self.vy = -math.cos(angle) * speed
+
+    def move(self):
+        """ Update position based on velocity """
+
+        self.x += self.vx
+        self.y += self.vy
+
+    def experienceDrag(self):
+        """ Slow particle down through drag """
+        self.vx *= self.drag
+        self.vy *= self.drag
+
+    def attract(self, other):
+        dx = (self.x - other.x)
+        dy = (self.y - other.y)
+        dist = math.hypot(dx, dy)
+
+        # as in Particle.attract, each is pulled towards the other by 0.2 * mass / dist ** 2
+        pull = 0.2 / dist ** 3
+        self.accelerateBy(-dx * pull * other.mass, -dy * pull * other.mass)
+        other.accelerateBy(dx * pull * self.mass, dy * pull * self.mass)
+
+    def accelerate(self, vector):
+        """ Change velocity by a given (angle, length) vector """
+        (angle, length) = vector
+        self.accelerateBy(math.sin(angle) * length, -math.cos(angle) * length)
+
+    def accelerateBy(self, ax, ay):
+        """ Change velocity by a given x, y vector """
+        self.vx += ax
+        self.vy += ay
+
+    def mouseMove(self, position):
+        """ Change velocity to move towards a given point """
+
+        (x, y) = position
+        self.vx = (x - self.x) * 0.1
+        self.vy = (y - self.y) * 0.1
+
+
+class CellGrid:
+    """ Uniform grid over particle positions, for finding particles near each other.
+        Particles are sorted by cell, so each cell is a run of the sorted order
+        that searchsorted finds. """
+
+    # the cells after a cell, in sorted order, that particles in it can touch
+    NEIGHBOURS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+    def __init__(self):
+        self.cell_size = None
+        self.order = np.zeros(0, dtype=int)
+        self.keys = np.zeros(0, dtype=int)
+
+    def build(self, x, y, cell_size):
+        """ File the particles at positions x, y in cells of side cell_size """
+
+        self.cell_size = cell_size
+        cx = np.floor(x / cell_size).astype(int)
+        cy = np.floor(y / cell_size).astype(int)
+        # leave a free row either side so neighbouring keys never wrap into the next column
+        self.cx_min = cx.min() - 1
+        self.cy_min = cy.min() - 1
+        self.rows = cy.max() - self.cy_min + 2
+        keys = (cx - self.cx_min) * self.rows + (cy - self.cy_min)
+        self.order = np.argsort(keys, kind='mergesort')
+        self.keys = keys[self.order]
+
+    def pairs(self):
+        """ Every pair of particles in the same or in neighbouring cells, as two index arrays with i < j """
+
+        n = len(self.keys)
+        rank = np.arange(n)
+        # later particles in the same cell, then everything in the neighbouring cells
+        starts = [rank + 1]
+        ends = [np.searchsorted(self.keys, self.keys, 'right')]
+        for dx, dy in self.NEIGHBOURS:
+            neighbour = self.keys + dx * self.rows + dy
+            starts.append(np.searchsorted(self.keys, neighbour, 'left'))
+            ends.append(np.searchsorted(self.keys, neighbour, 'right'))
+
+        first, second = [], []
+        for start, end in zip(starts, ends):
+            counts = np.maximum(end - start, 0)
+            total = counts.sum()
+            # the k-th pair of a particle's run goes with particle start + k
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(self.order[np.repeat(rank, counts)])
+            second.append(self.order[np.repeat(start, counts) + offsets])
+        first, second = np.concatenate(first), np.concatenate(second)
+        return (np.minimum(first, second), np.maximum(first, second))
+
+
+class QuadTree:
+    """ Barnes-Hut quadtree over particle positions and masses.
+        Level L of the tree holds the non-empty squares of side size / 2**L,
+        found by sorting the particles along a Morton (Z-order) curve, with
+        each square's total mass and centre of mass. """
+
+    # levels below the root; squares on the deepest level may hold several particles
+    DEPTH = 16
+
+    def build(self, x, y, mass):
+        """ File particles at positions x, y with masses mass """
+
+        self.x, self.y, self.mass = x, y, mass
+        x0, y0 = x.min(), y.min()
+        self.size = max(x.max() - x0, y.max() - y0) or 1.0
+        cells = 1 << self.DEPTH
+        qx = np.minimum((x - x0) / self.size * cells, cells - 1).astype(np.int64)
+        qy = np.minimum((y - y0) / self.size * cells, cells - 1).astype(np.int64)
+        self.codes = self.interleave(qx) | (self.interleave(qy) << 1)
+
+        order = np.argsort(self.codes, kind='mergesort')
+        codes, m = self.codes[order], mass[order]
+        mx, my = m * x[order], m * y[order]
+
+        # per level: square codes, particle counts, masses, centres of mass
+        # and the range of each square's children on the next level
+        self.levels = []
+        for level in range(self.DEPTH + 1):
+            prefixes = codes >> (2 * (self.DEPTH - level))
+            starts = np.flatnonzero(np.concatenate(([True], prefixes[1:] != prefixes[:-1])))
+            node_mass = np.add.reduceat(m, starts)
+            self.levels.append({'prefix': prefixes[starts],
+                                'count': np.diff(np.append(starts, len(codes))),
+                                'mass': node_mass,
+                                'x': np.add.reduceat(mx, starts) / node_mass,
+                                'y': np.add.reduceat(my, starts) / node_mass})
+            if len(starts) == len(codes):
+                # every particle has a square to itself
+                break
+        for level, below in zip(self.levels, self.levels[1:]):
+            parents = below['prefix'] >> 2
+            level['first'] = np.searchsorted(parents, level['prefix'], 'left')
+            level['last'] = np.searchsorted(parents, level['prefix'], 'right')
+
+    @staticmethod
+    def interleave(q):
+        """ Spread the low 16 bits of q out to the even bits """
+
+        q = (q | (q << 8)) & 0x00FF00FF
+        q = (q | (q << 4)) & 0x0F0F0F0F
+        q = (q | (q << 2)) & 0x33333333
+        q = (q | (q << 1)) & 0x55555555
+        return q
+
+    def accelerations(self, theta):
+        """ Acceleration each particle gets from the attraction of all the others, as in
+            Particle.attract. A square is taken as one body at its centre of mass when its
+            side is less than theta times its distance; theta = 0 sums every pair. """
+
+        n = len(self.x)
+        ax, ay = np.zeros(n), np.zeros(n)
+        # every particle starts at the root
+        particle = np.arange(n)
+        node = np.zeros(n, dtype=int)
+        for depth, level in enumerate(self.levels):
+            side = self.size / 2 ** depth
+            mass, cx, cy = level['mass'][node], level['x'][node], level['y'][node]
+
+            # a particle's own square attracts it with the rest of its mass only
+            member = (self.codes[particle] >> (2 * (self.DEPTH - depth))) == level['prefix'][node]
+            m = self.mass[particle]
+            px, py = self.x[particle], self.y[particle]
+            rest = np.where(member, mass - m, mass)
+            # (a particle alone in its square leaves no mass to divide by)
+            divisor = np.where(rest > 0, rest, 1.0)
+            cx = np.where(member, (mass * cx - m * px) / divisor, cx)
+            cy = np.where(member, (mass * cy - m * py) / divisor, cy)
+            dx, dy = cx - px, cy - py
+            dist = np.hypot(dx, dy)
+
+            leaf = (level['count'][node] == 1) | (depth == len(self.levels) - 1)
+            accept = leaf | (~member & (side < theta * dist))
+            pull = accept & (rest > 0) & (dist > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scale = np.where(pull, 0.2 * rest / dist ** 3, 0.0)
+            ax += np.bincount(particle, weights=np.where(pull, scale * dx, 0.0), minlength=n)
+            ay += np.bincount(particle, weights=np.where(pull, scale * dy, 0.0), minlength=n)
+
+            # open the rest of the squares: each particle moves on to their children
+            opened = ~accept
+            if not opened.any():
+                break
+            particle, node = particle[opened], node[opened]
+            first, last = level['first'][node], level['last'][node]
+            counts = last - first
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            particle = np.repeat(particle, counts)
+            node = np.repeat(first, counts) + offsets
+
+        return (ax, ay)
+
+
+def exactAccelerations(x, y, mass, chunk=512):
+    """ The accelerations of QuadTree.accelerations, summed over every pair """
+
+    n = len(x)
+    ax, ay = np.zeros(n), np.zeros(n)
+    for start in range(0, n, chunk):
+        dx = x[np.newaxis, :] - x[start:start + chunk, np.newaxis]
+        dy = y[np.newaxis, :] - y[start:start + chunk, np.newaxis]
+        dist = np.hypot(dx, dy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(dist > 0, 0.2 * mass / dist ** 3, 0.0)
+        ax[start:start + chunk] = (scale * dx).sum(axis=1)
+        ay[start:start + chunk] = (scale * dy).sum(axis=1)
+    return (ax, ay)
+
+
+def arrayProperty(name):
+    """ Property for a particle attribute that is held in an ArrayEnvironment array """
+
+    def get(self):
+        return self.environment.arrays[name].item(self.index)
+
+    def set(self, value):
+        self.environment.arrays[name][self.index] = value
+
+    return property(get, set)
+
+
+class ParticleView(Particle, object):
+    """ A Particle whose position, velocity and physical properties are one
+        entry in each of the arrays of an ArrayEnvironment """
+
+    x = arrayProperty('x')
+    y = arrayProperty('y')
+    size = arrayProperty('size')
+    mass = arrayProperty('mass')
+    speed = arrayProperty('speed')
+    angle = arrayProperty('angle')
+    drag = arrayProperty('drag')
+    elasticity = arrayProperty('elasticity')
+
+    def __init__(self, environment, index, colour=(0, 0, 255), thickness=0):
+        self.environment = environment
+        self.index = index
+        self.colour = colour
+        self.thickness = thickness
+
+
+class ParticleIndex:
+    """ Grid of square cells of side cell_size, each holding the indices of
+        the particles whose centres are in it. Particles are moved to another
+        cell only when their cell has changed, see refresh. """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        # the cell of each particle, by index
+        self.keys = []
+        # the largest particle filed, so queries know how far to look
+        self.reach = 0
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def add(self, key, size):
+        """ File the next particle, of the given size, in cell key """
+
+        self.cells.setdefault(key, set()).add(len(self.keys))
+        self.keys.append(key)
+        self.reach = max(self.reach, size)
+
+    def move(self, i, key):
+        """ Refile particle i in cell key, if it isn't there already """
+
+        old = self.keys[i]
+        if key != old:
+            cell = self.cells[old]
+            cell.discard(i)
+            if not cell:
+                del self.cells[old]
+            self.cells.setdefault(key, set()).add(i)
+            self.keys[i] = key
+
+    def refresh(self, keys):
+        """ Given the cell of every particle, move those whose cell has changed """
+
+        for i, key in enumerate(keys):
+            self.move(i, key)
+
+    def near(self, x, y, radius):
+        """ Indices of the particles whose centres are in the cells within radius of x, y """
+
+        (left, top) = self.cell(x - radius, y - radius)
+        (right, bottom) = self.cell(x + radius, y + radius)
+        found = []
+        if (right - left + 1) * (bottom - top + 1) > len(self.cells):
+            # bigger than the grid: go through the cells there are instead
+            for (cx, cy), cell in self.cells.items():
+                if left <= cx <= right and top <= cy <= bottom:
+                    found.extend(cell)
+            return found
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.extend(cell)
+        return found
+
+    def nearest(self, x, y, k, distance):
+        """ Indices of the k particles nearest x, y by distance(index), nearest first.
+            Looks through square rings of cells around x, y until none of the
+            particles further out can be nearer, or until it has looked at more
+            cells than are occupied, when it goes through the rest of those. """
+
+        (cx, cy) = self.cell(x, y)
+        found = []
+        seen = 0
+        probed = 0
+        ring = 0
+        while seen < len(self.keys):
+            if probed > len(self.cells):
+                # far from the particles: rings are mostly empty, take every cell outside them
+                for (kx, ky), cell in self.cells.items():
+                    if max(abs(kx - cx), abs(ky - cy)) >= ring:
+                        found.extend((distance(i), i) for i in cell)
+                break
+            if ring == 0:
+                ring_cells = [(cx, cy)]
+            else:
+                ring_cells = [(cx + dx, cy + ring) for dx in range(-ring, ring + 1)] + \
+                             [(cx + dx, cy - ring) for dx in range(-ring, ring + 1)] + \
+                             [(cx + ring, cy + dy) for dy in range(-ring + 1, ring)] + \
+                             [(cx - ring, cy + dy) for dy in range(-ring + 1, ring)]
+            probed += len(ring_cells)
+            for key in ring_cells:
+                for i in self.cells.get(key, ()):
+                    found.append((distance(i), i))
+                    seen += 1
+            # anything outside the rings so far is at least ring cells away
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= ring * self.cell_size:
+                break
+            ring += 1
+        return [i for (d, i) in heapq.nsmallest(k, found)]
+
+
 class Environment:
     """ Defines the boundary of a simulation and its properties """
 
@@ -102,6 +529,9 @@ class Environment:
         self.elasticity = 0.75
         self.acceleration = (0, 0)
 
+        self.particle_class = Particle
+        # a ParticleIndex once buildIndex has been called
+        self.index = None
         self.particle_functions1 = []
         self.particle_functions2 = []
         self.function_dict = {
@@ -138,7 +568,7 @@ class Environment:
             x = kargs.get('x', random.uniform(size, self.width - size))
             y = kargs.get('y', random.uniform(size, self.height - size))
 
-            particle = Particle((x, y), size, mass)
+            particle = self.particle_class((x, y), size, mass)
             particle.speed = kargs.get('speed', random.random())
             particle.angle = kargs.get('angle', random.uniform(0, math.pi * 2))
             particle.colour = kargs.get('colour', (0, 0, 255))
@@ -146,6 +576,8 @@ class Environment:
             particle.elasticity = kargs.get('elasticity', 0.9)
 
             self.particles.append(particle)
+            if self.index is not None:
+                self.index.add(self.index.cell(x, y), size)
 
     def update(self):
         """  Calls particle functions """
@@ -157,6 +589,9 @@ class Environment:
                 for f in self.particle_functions2:
                     f(particle, particle2)
 
+        if self.index is not None:
+            self.refreshIndex()
+
     def bounce(self, particle):
         """ Tests whether a particle has hit the boundary of the environment """
 
@@ -180,10 +615,462 @@ class Environment:
             particle.angle = math.pi - particle.angle
             particle.speed *= self.elasticity
 
+    def buildIndex(self, cell_size=None):
+        """ Keep the particles in a grid, so finding them doesn't mean going through them all.
+            The grid is brought up to date after every update, or by calling refreshIndex.
+            Cells default to the width of the largest particle. """
+
+        if cell_size is None:
+            cell_size = 2 * max([particle.size for particle in self.particles] or [10])
+        self.index = ParticleIndex(cell_size)
+        for particle in self.particles:
+            self.index.add(self.index.cell(particle.x, particle.y), particle.size)
+
+    def refreshIndex(self):
+        """ Move particles that have moved to another cell of the index """
+
+        cell = self.index.cell
+        self.index.refresh([cell(particle.x, particle.y) for particle in self.particles])
+
     def findParticle(self, x, y):
         """ Returns any particle that occupies position x, y """
 
+        if self.index is not None:
+            particles = self.findParticles(x, y, 0)
+            return particles[0] if particles else None
+
         for particle in self.particles:
             if math.hypot(particle.x - x, particle.y - y) <= particle.size:
                 return particle
-        return None
\ No newline at end of file
+        return None
+
+    def findParticles(self, x, y, radius):
+        """ Returns every particle within radius of position x, y, e.g. caught in a blast,
+            in the order of self.particles """
+
+        if self.index is not None:
+            candidates = [self.particles[i] for i in sorted(self.index.near(x, y, radius + self.index.reach))]
+        else:
+            candidates = self.particles
+        return [particle for particle in candidates
+                if math.hypot(particle.x - x, particle.y - y) <= radius + particle.size]
+
+    def nearestParticles(self, x, y, k=1):
+        """ Returns the k particles whose centres are nearest position x, y, nearest first """
+
+        particles = self.particles
+        if self.index is not None:
+            indices = self.index.nearest(x, y, k, lambda i: math.hypot(particles[i].x - x, particles[i].y - y))
+        else:
+            indices = heapq.nsmallest(k, range(len(particles)),
+                                      key=lambda i: (math.hypot(particles[i].x - x, particles[i].y - y), i))
+        return [particles[i] for i in indices]
+
+
+class ArrayEnvironment(Environment):
+    """ An Environment that keeps particle state in NumPy arrays and runs the
+        single-particle functions on all particles at once.
+        Particles are ParticleViews on the arrays, so they can be drawn and
+        moved about as usual. Every single-particle function is applied to
+        all particles before the two-particle functions are.
+        With broadphase set, 'collide' is only called for the pairs of
+        particles that overlap at the start of the step, found through a
+        CellGrid, and before any other two-particle function; particles
+        knocked into each other are caught on the next step. Clear it to
+        test every pair.
+        With barnes_hut set, 'attract' is worked out for all particles at
+        once from a QuadTree, taking far off groups of particles as one body
+        at their centre of mass, depending on the opening angle theta. """
+
+    ARRAYS = ('x', 'y', 'size', 'mass', 'speed', 'angle', 'drag', 'elasticity')
+
+    def __init__(self, size):
+        if np is None:
+            raise ImportError("ArrayEnvironment needs numpy")
+        Environment.__init__(self, size)
+        self.arrays = dict((name, np.zeros(0)) for name in self.ARRAYS)
+        self.arrays['size'] = np.zeros(0, dtype=int)
+        self.broadphase = True
+        self.grid = CellGrid()
+        self.barnes_hut = False
+        self.theta = 0.5
+        self.tree = QuadTree()
+
+        self.function_dict.update({
+            'move': (1, self.moveAll),
+            'drag': (1, self.dragAll),
+            'bounce': (1, self.bounceAll),
+            'accelerate': (1, self.accelerateAll)})
+
+    def addParticles(self, n=1, **kargs):
+        """ Add n particles with properties given by keyword arguments """
+
+        # build them as Particles, so they come out as they would in an Environment
+        first = len(self.particles)
+        Environment.addParticles(self, n, **kargs)
+        particles = self.particles[first:]
+
+        for name in self.ARRAYS:
+            values = np.array([getattr(particle, name) for particle in particles])
+            self.arrays[name] = np.concatenate((self.arrays[name], values))
+        self.particles[first:] = [ParticleView(self, first + i, particle.colour, particle.thickness)
+                                  for i, particle in enumerate(particles)]
+
+    def update(self):
+        """ Calls particle functions """
+
+        for f in self.particle_functions1:
+            f()
+
+        pair_functions = self.particle_functions2
+        if self.broadphase:
+            collide_function = self.function_dict['collide'][1]
+            if collide_function in pair_functions:
+                pair_functions = [f for f in pair_functions if f is not collide_function]
+                particles = self.particles
+                for i, j in self.overlappingPairs():
+                    collide_function(particles[i], particles[j])
+        if self.barnes_hut:
+            attract_function = self.function_dict['attract'][1]
+            if attract_function in pair_functions:
+                pair_functions = [f for f in pair_functions if f is not attract_function]
+                self.attractAll()
+
+        if pair_functions:
+            for i, particle in enumerate(self.particles):
+                for particle2 in self.particles[i + 1:]:
+                    for f in pair_functions:
+                        f(particle, particle2)
+
+        if self.index is not None:
+            self.refreshIndex()
+
+    def buildIndex(self, cell_size=None):
+        Environment.buildIndex(self, cell_size)
+        # the cells of the particles at the last refresh
+        self.index_cells = None
+
+    def refreshIndex(self):
+        """ Move particles that have moved to another cell of the index,
+            finding which they are with numpy rather than one by one """
+
+        a = self.arrays
+        cells = np.floor(np.column_stack((a['x'], a['y'])) / self.index.cell_size).astype(int)
+        old = self.index_cells
+        if old is None or len(old) != len(cells):
+            moved = range(len(cells))
+        else:
+            moved = np.flatnonzero((cells != old).any(axis=1)).tolist()
+        for i in moved:
+            self.index.move(i, tuple(cells[i].tolist()))
+        self.index_cells = cells
+
+    def overlappingPairs(self, strip=None):
+        """ (i, j) for every pair of particles that overlap, i < j, in the order update would test them.
+            Given the strip each particle is in, only pairs from different strips are returned. """
+
+        if len(self.particles) < 2:
+            return []
+        a = self.arrays
+        x, y, size = a['x'], a['y'], a['size']
+        # overlapping particles are never more than a cell apart
+        self.grid.build(x, y, 2 * size.max() + 1)
+        i, j = self.grid.pairs()
+        overlap = np.hypot(x[i] - x[j], y[i] - y[j]) < size[i] + size[j]
+        if strip is not None:
+            overlap &= strip[i] != strip[j]
+        i, j = i[overlap], j[overlap]
+        order = np.lexsort((j, i))
+        return zip(i[order].tolist(), j[order].tolist())
+
+    def attractAll(self):
+        """ attract for every pair of particles, through the quadtree """
+
+        if len(self.particles) < 2:
+            return
+        a = self.arrays
+        self.tree.build(a['x'], a['y'], a['mass'])
+        self.accelerateBy(*self.tree.accelerations(self.theta))
+
+    def accelerateBy(self, ax, ay):
+        """ Add accelerations given as x and y components to every particle's velocity """
+
+        a = self.arrays
+        # y points down the screen, but up in angle and speed
+        (a['angle'][:], a['speed'][:]) = addVectorArrays(a['angle'], a['speed'],
+                                                         0.5 * math.pi - np.arctan2(-ay, ax), np.hypot(ax, ay))
+
+    def attractionAccuracy(self, thetas=(0.3, 0.5, 0.7, 1.0)):
+        """ For each opening angle, how far Barnes-Hut accelerations are off the exact pairwise ones
+            and how long they take, as rows of (theta, mean and max error relative to each
+            particle's acceleration, rms error relative to the rms acceleration, seconds).
+            Particles whose pulls nearly cancel out make for large relative errors, which
+            the rms figure doesn't pick up. The first row is the exact sum itself. """
+
+        a = self.arrays
+        x, y, mass = a['x'], a['y'], a['mass']
+        start = time.time()
+        exact = exactAccelerations(x, y, mass)
+        rows = [(0.0, 0.0, 0.0, 0.0, time.time() - start)]
+        magnitude = np.hypot(*exact)
+        rms = np.sqrt((magnitude ** 2).mean())
+        for theta in thetas:
+            start = time.time()
+            self.tree.build(x, y, mass)
+            ax, ay = self.tree.accelerations(theta)
+            seconds = time.time() - start
+            error = np.hypot(ax - exact[0], ay - exact[1])
+            relative = error / magnitude
+            rows.append((theta, relative.mean(), relative.max(), np.sqrt((error ** 2).mean()) / rms, seconds))
+        return rows
+
+    def moveAll(self):
+        a = self.arrays
+        a['x'] += np.sin(a['angle']) * a['speed']
+        a['y'] -= np.cos(a['angle']) * a['speed']
+
+    def dragAll(self):
+        a = self.arrays
+        a['speed'] *= a['drag']
+
+    def accelerateAll(self):
+        a = self.arrays
+        (angle, length) = self.acceleration
+        (a['angle'][:], a['speed'][:]) = addVectorArrays(a['angle'], a['speed'], angle, length)
+
+    def bounceAll(self):
+        """ bounce for every particle """
+
+        a = self.arrays
+        x, y, size, angle = a['x'], a['y'], a['size'], a['angle']
+
+        right = x > self.width - size
+        left = ~right & (x < size)
+        x[right] = 2 * (self.width - size[right]) - x[right]
+        x[left] = 2 * size[left] - x[left]
+        side = right | left
+        angle[side] = - angle[side]
+
+        bottom = y > self.height - size
+        top = ~bottom & (y < size)
+        y[bottom] = 2 * (self.height - size[bottom]) - y[bottom]
+        y[top] = 2 * size[top] - y[top]
+        end = bottom | top
+        angle[end] = math.pi - angle[end]
+
+        # a particle that hits a corner loses speed to both walls
+        a['speed'] *= self.elasticity ** (side.astype(int) + end)
+
+
+class CartesianEnvironment(Environment):
+    """ An Environment of CartesianParticles, with the particle functions
+        working on their x, y velocities rather than on angle and speed """
+
+    def __init__(self, size):
+        Environment.__init__(self, size)
+        self.particle_class = CartesianParticle
+        self.acceleration_x = self.acceleration_y = 0
+        self.function_dict.update({
+            'accelerate': (1, lambda p: p.accelerateBy(self.acceleration_x, self.acceleration_y)),
+            'collide': (2, lambda p1, p2: collideCartesian(p1, p2))})
+
+    def update(self):
+        """ Calls particle functions """
+
+        # acceleration is given as (angle, length), so convert it once for every particle
+        (angle, length) = self.acceleration
+        self.acceleration_x = math.sin(angle) * length
+        self.acceleration_y = -math.cos(angle) * length
+        Environment.update(self)
+
+    def bounce(self, particle):
+        """ Tests whether a particle has hit the boundary of the environment """
+
+        if particle.x > self.width - particle.size:
+            particle.x = 2 * (self.width - particle.size) - particle.x
+            particle.vx = - particle.vx * self.elasticity
+            particle.vy *= self.elasticity
+
+        elif particle.x < particle.size:
+            particle.x = 2 * particle.size - particle.x
+            particle.vx = - particle.vx * self.elasticity
+            particle.vy *= self.elasticity
+
+        if particle.y > self.height - particle.size:
+            particle.y = 2 * (self.height - particle.size) - particle.y
+            particle.vx *= self.elasticity
+            particle.vy = - particle.vy * self.elasticity
+
+        elif particle.y < particle.size:
+            particle.y = 2 * particle.size - particle.y
+            particle.vx *= self.elasticity
+            particle.vy = - particle.vy * self.elasticity
+
+
+# the shared particle arrays, as seen from a ParallelEnvironment worker process
+worker_arrays = {}
+
+# weak references to the ParallelEnvironments whose workers are running, each with a
+# callback that stops the workers once its environment has been collected
+pool_refs = set()
+
+
+def stopPool(pool):
+    pool.terminate()
+    pool.join()
+
+
+def initWorker(shared):
+    for name, raw in shared.items():
+        worker_arrays[name] = np.ctypeslib.as_array(raw)
+
+
+def stepStrip(task):
+    """ Step the particles of one strip, in a worker process, as an ArrayEnvironment would """
+
+    (indices, functions, settings) = task
+    env = ArrayEnvironment((settings['width'], settings['height']))
+    env.elasticity = settings['elasticity']
+    env.acceleration = settings['acceleration']
+    env.broadphase = settings['broadphase']
+    env.addFunctions(functions)
+
+    # work on a copy of the strip, then write it back
+    for name in ArrayEnvironment.ARRAYS:
+        env.arrays[name] = worker_arrays[name][indices]
+    env.particles = [ParticleView(env, i) for i in range(len(indices))]
+    env.update()
+    for name in ArrayEnvironment.ARRAYS:
+        worker_arrays[name][indices] = env.arrays[name]
+
+
+class ParallelEnvironment(ArrayEnvironment):
+    """ An ArrayEnvironment that steps particles on several processes.
+        The particle arrays are in shared memory. Each update splits the
+        domain into as many strips across x as there are workers, holding
+        equal numbers of particles, and each worker runs the single-particle
+        functions and 'collide' for the particles of one strip. The pairs
+        that straddle two strips are collided afterwards, so a particle that
+        hits several others in one step meets those in its own strip first.
+        'attract' is then run on all particles.
+        The workers stop on close, at the end of a with statement, or once
+        the environment has been garbage collected. """
+
+    def __init__(self, size, workers=None):
+        ArrayEnvironment.__init__(self, size)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.function_names = []
+        self.shared = {}
+        self.pool = None
+
+    def addFunctions(self, function_list):
+        ArrayEnvironment.addFunctions(self, function_list)
+        self.function_names += [name for name in function_list if name in self.function_dict]
+
+    def addParticles(self, n=1, **kargs):
+        ArrayEnvironment.addParticles(self, n, **kargs)
+
+        # the workers are given the shared arrays when they start, so new ones need new workers
+        self.close()
+        for name in self.ARRAYS:
+            raw = RawArray(np.ctypeslib.as_ctypes_type(self.arrays[name].dtype), len(self.particles))
+            array = np.ctypeslib.as_array(raw)
+            array[:] = self.arrays[name]
+            self.shared[name] = raw
+            self.arrays[name] = array
+
+    def close(self):
+        """ Stop the worker processes """
+
+        if self.pool is not None:
+            pool_refs.discard(self.pool_ref)
+            stopPool(self.pool)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def strips(self):
+        """ The indices of the particles in each strip, from left to right """
+
+        return np.array_split(np.argsort(self.arrays['x'], kind='mergesort'), self.workers)
+
+    def update(self):
+        """ Calls particle functions """
+
+        if self.workers < 2:
+            return ArrayEnvironment.update(self)
+        if self.pool is None:
+            pool = self.pool = multiprocessing.Pool(self.workers, initWorker, (self.shared,))
+            # the callback mustn't refer to self, which function_dict keeps in a cycle:
+            # on Python 2 a __del__ would stop the cycle from ever being collected
+            self.pool_ref = weakref.ref(self, lambda ref: (pool_refs.discard(ref), stopPool(pool)))
+            pool_refs.add(self.pool_ref)
+
+        strips = self.strips()
+        strip = np.zeros(len(self.particles), dtype=int)
+        for k, indices in enumerate(strips):
+            strip[indices] = k
+
+        settings = {'width': self.width, 'height': self.height, 'elasticity': self.elasticity,
+                    'acceleration': self.acceleration, 'broadphase': self.broadphase}
+        local = [name for name in self.function_names if name != 'attract']
+        self.pool.map(stepStrip, [(indices, local, settings) for indices in strips])
+
+        # the pairs that are in two strips
+        if 'collide' in self.function_names:
+            collide_function = self.function_dict['collide'][1]
+            particles = self.particles
+            if self.broadphase:
+                pairs = self.overlappingPairs(strip)
+            else:
+                pairs = [(i, j) for i in range(len(particles)) for j in range(i + 1, len(particles))
+                         if strip[i] != strip[j]]
+            for i, j in pairs:
+                collide_function(particles[i], particles[j])
+
+        if 'attract' in self.function_names:
+            if self.barnes_hut:
+                self.attractAll()
+            else:
+                attract_function = self.function_dict['attract'][1]
+                for i, particle in enumerate(self.particles):
+                    for particle2 in self.particles[i + 1:]:
+                        attract_function(particle, particle2)
+
+        if self.index is not None:
+            self.refreshIndex()
+
+
+def parallelScaling(n=20000, steps=10, workers=(1, 2, 4, 8), functions=('move', 'drag', 'bounce', 'collide')):
+    """ Time the same scene stepped on each number of workers, printing the speedup
+        over one worker and the efficiency (speedup per worker) """
+
+    rows = []
+    for count in workers:
+        random.seed(0)
+        env = ParallelEnvironment((2000, 2000), workers=count)
+        env.addFunctions(list(functions))
+        env.addParticles(n, size=4)
+        # the first step also starts the workers
+        env.update()
+        start = time.time()
+        for step in range(steps):
+            env.update()
+        seconds = (time.time() - start) / steps
+        env.close()
+        rows.append((count, seconds))
+
+    print("%d particles, %s, %d cores" % (n, ", ".join(functions), multiprocessing.cpu_count()))
+    print("workers  ms/step  speedup  efficiency")
+    for count, seconds in rows:
+        speedup = rows[0][1] / seconds
+        print("%7d  %7.1f  %7.2f  %10.2f" % (count, seconds * 1000, speedup, speedup / count))
+    return rows
+
+
+if __name__ == '__main__':
+    parallelScaling()
@@ -0,0 +1,270 @@
+"""
+Scenario benchmarks for the Tanks scene
+
+Builds reproducible scenes (so many zombies, bats and runners, projectiles of
+each weapon type, live explosions and balloons) under the SDL dummy video
+driver and times Tanks.Update and Tanks.Render frame by frame. Per-phase
+ms/frame percentiles and allocation figures are printed and written as JSON,
+so runs can be compared across commits:
+
+    python benchmark.py --frames 300 --output bench.json
+    python benchmark.py --scenario horde --scenario barrage
+
+--vector runs micro-benchmarks of the geometry.Vector2D operations instead.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import gc
+import json
+import time
+import timeit
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import collections
+import numpy as np
+import pygame
+import colors
+import geometry as geo
+import utilities
+from headless import ScriptedInput
+from scenes import Tanks
+from tanks import *
+
+
+SCENARIOS = collections.OrderedDict([
+    ('idle', {}),
+    ('horde', dict(zombies=60, bats=20, runners=20)),
+    ('barrage', dict(zombies=10, cannonballs=20, bombs=20, bullets=20, lasers=2)),
+    ('explosions', dict(zombies=5, explosions=40)),
+    ('balloons', dict(zombies=5, balloons=40)),
+    ('volley', dict(cannonballs=200, bombs=200, bullets=200)),
+    ('swarm', dict(zombies=800, bats=200, runners=200)),
+    ('siege', dict(zombies=300, bats=50, runners=50, cannonballs=20, bombs=20, bullets=20, balloons=20)),
+    ('laser', dict(zombies=200, bats=50, runners=50, lasers=1)),
+    ('mixed', dict(zombies=40, bats=10, runners=10, cannonballs=10, bombs=10, bullets=10, lasers=1,
+                   explosions=20, balloons=20)),
+])
+
+BALLOON_COLORS = [colors.DARK_GREEN, colors.DARK_BLUE, colors.DARK_RED]
+
+
+class Scenario(object):
+    """a Tanks scene kept at a fixed population while it is being timed
+
+    Enemies, projectiles and balloons that die or leave the field are
+    replaced between frames, outside the timed phases, so every frame sees
+    the same load.
+    """
+
+    def __init__(self, screen, seed=0, dirty_rects=False, zombies=0, bats=0, runners=0, cannonballs=0,
+                 bombs=0, bullets=0, lasers=0, explosions=0, balloons=0):
+        random.seed(seed)
+        np.random.seed(seed)
+        # count this scenario's pool traffic only
+        reset_pool_stats()
+        self.width, self.height = screen.get_size()
+        self.mouse = ScriptedInput(lambda tick: ((self.width // 2, self.height // 2), False))
+        self.mouse.advance(0)
+        self.scene = Tanks(dirty_rects=dirty_rects, mouse=self.mouse, save_file=None)
+        self.scene.initGraphics(screen)
+        for baddy in self.scene.baddies.sprites():
+            baddy.kill()
+        self.enemies = {Zombie: zombies, Bat: bats, Runner: runners}
+        self.shots = {Cannonball: cannonballs, Bomb: bombs, Bullet: bullets, Laser: lasers}
+        self.explosions = explosions
+        self.balloons = balloons
+        self.refill()
+
+    def count(self, group, cls):
+        return sum(1 for sprite in group if type(sprite) is cls)
+
+    def refill(self):
+        scene = self.scene
+        # enemies spread out over the right half of the field, clear of the tank
+        for cls, n in self.enemies.items():
+            for i in range(n - self.count(scene.baddies, cls)):
+                enemy = acquire(cls, 1)
+                enemy.x = random.uniform(self.width / 2, self.width)
+                enemy.rect.x = int(enemy.x)
+                scene.addBaddie(enemy)
+        for cls, n in self.shots.items():
+            for i in range(n - self.count(scene.projectiles, cls)):
+                if cls is Laser:
+                    v = geo.Vector2D(2 * self.width, -random.uniform(0, self.height))
+                    scene.tank.lastShootTime = utilities.now()
+                else:
+                    v = geo.Vector2D(random.uniform(2, 10), -random.uniform(5, 15))
+                scene.addProjectile(acquire(cls, scene.tank.origin(), v))
+        for i in range(self.explosions - len(scene.explosions)):
+            exp = utilities.SpriteStripAnim('explosion.png', (0, 0, 256, 256), (8, 7), colorkey=-1, loop=True,
+                                            size=EXPLOSION_SIZE)
+            exp.iter()
+            pos = random.uniform(0, self.width), random.uniform(0, self.height)
+            scene.explosions.append((exp, pos))
+        for i in range(self.balloons - len(scene.balloons)):
+            pos = random.uniform(100, self.width - 100), random.uniform(self.height - 100, self.height - 50)
+            scene.balloons.add(acquire(Balloon, pos, random.choice(BALLOON_COLORS)))
+        # keep playing even when the tank is overrun
+        scene.next = scene
+
+    def update(self):
+        utilities.sim_clock.tick()
+        self.scene.Update()
+
+    def render(self):
+        self.scene.Render()
+        self.scene.Present()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(q):
+        return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'mean': sum(samples) / len(samples), 'max': samples[-1]}
+
+
+def time_phases(scenario, frames):
+    timings = {'update': [], 'render': []}
+    for frame in range(frames):
+        for phase in ('update', 'render'):
+            start = time.perf_counter()
+            getattr(scenario, phase)()
+            timings[phase].append((time.perf_counter() - start) * 1000.0)
+        scenario.refill()
+    return dict((phase, percentiles(samples)) for phase, samples in timings.items())
+
+
+def trace_allocations(scenario, frames):
+    """bytes allocated per frame by each phase: net growth and transient peak"""
+    totals = {'update': [0, 0], 'render': [0, 0]}
+    gc_before = sum(stat['collections'] for stat in gc.get_stats())
+    tracemalloc.start()
+    for frame in range(frames):
+        for phase in ('update', 'render'):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            getattr(scenario, phase)()
+            after, peak = tracemalloc.get_traced_memory()
+            totals[phase][0] += after - before
+            totals[phase][1] += peak - before
+        scenario.refill()
+    tracemalloc.stop()
+    gc_after = sum(stat['collections'] for stat in gc.get_stats())
+
+    report = dict((phase, {'net_bytes_per_frame': net / float(frames), 'peak_bytes_per_frame': peak / float(frames)})
+                  for phase, (net, peak) in totals.items())
+    report['gc_collections'] = gc_after - gc_before
+    return report
+
+
+def run_scenario(screen, name, frames, warmup, dirty_rects=False):
+    params = SCENARIOS[name]
+    scenario = Scenario(screen, dirty_rects=dirty_rects, **params)
+    for frame in range(warmup):
+        scenario.update()
+        scenario.render()
+        scenario.refill()
+    result = {'params': params, 'frames': frames}
+    result.update(time_phases(scenario, frames))
+    result['allocations'] = trace_allocations(scenario, min(frames, 100))
+    result['pools'] = pool_stats()
+    result['backlog'] = {'size': len(scenario.scene.baddie_queue), 'bytes': scenario.scene.baddie_queue.nbytes()}
+    # hand the sprites back, so the next scenario doesn't count them as live
+    scenario.scene.releaseSprites()
+    return result
+
+
+VECTOR_OPS = collections.OrderedDict([
+    ('add', 'a + b'),
+    ('sub', 'a - b'),
+    ('iadd', 'c += b'),
+    ('mul', 'a * 2.5'),
+    ('rmul', '2.5 * a'),
+    ('truediv', 'a / 2.5'),
+    ('unpack', 'x, y = a'),
+    ('length', 'a.length()'),
+    ('dot', 'a.dot(b)'),
+    ('angle', 'a.angle()'),
+    ('angle_between', 'Vector2D.angle_between(a, b)'),
+    ('create_from_angle', 'Vector2D.create_from_angle(0.5, 3.0)'),
+    ('add_scaled_ip', 'c.add_scaled_ip(b, 0.5)'),
+    ('set', 'c.set(1.0, 2.0)'),
+])
+
+
+def vector_benchmarks(number=200000):
+    """ns per Vector2D operation, None for operations the class doesn't support"""
+    setup = 'from geometry import Vector2D; a = Vector2D(3.0, 4.0); b = Vector2D(-1.5, 2.0); c = Vector2D(0.0, 0.0)'
+    results = collections.OrderedDict()
+    for name, stmt in VECTOR_OPS.items():
+        timer = timeit.Timer(stmt, setup=setup)
+        try:
+            results[name] = min(timer.repeat(5, number)) / number * 1e9
+        except (AttributeError, TypeError):
+            results[name] = None
+    return results
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run, may be repeated (default: all)')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--size', type=int, nargs=2, default=(320, 240))
+    parser.add_argument('--dirty-rects', action='store_true', help='render with dirty rectangles')
+    parser.add_argument('--vector', action='store_true', help='run the Vector2D micro-benchmarks instead')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    if args.vector:
+        results = {'commit': commit(),
+                   'python': platform.python_version(),
+                   'vector_ns_per_op': vector_benchmarks()}
+        for name, ns in results['vector_ns_per_op'].items():
+            print('{0:<18} {1}'.format(name, 'unsupported' if ns is None else '{0:.1f} ns'.format(ns)))
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('results written to {0}'.format(args.output))
+        return
+
+    pygame.init()
+    screen = pygame.display.set_mode(args.size)
+
+    results = {'commit': commit(),
+               'python': platform.python_version(),
+               'pygame': pygame.version.ver,
+               'size': list(args.size),
+               'dirty_rects': args.dirty_rects,
+               'scenarios': collections.OrderedDict()}
+
+    print('{0:<12} {1:>28} {2:>28}'.format('scenario', 'update ms p50/p95/p99', 'render ms p50/p95/p99'))
+    for name in args.scenario or SCENARIOS:
+        result = run_scenario(screen, name, args.frames, args.warmup, args.dirty_rects)
+        results['scenarios'][name] = result
+        print('{0:<12} {1:>28} {2:>28}'.format(name, *['{p50:.3f}/{p95:.3f}/{p99:.3f}'.format(**result[phase])
+                                                      for phase in ('update', 'render')]))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('results written to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
 import math
+from collections import OrderedDict
 from numbers import Number
 import pygame
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def rot_center(image, angle):
     """rotate an image while keeping its center and size"""
@@ -13,38 +19,214 @@ def rot_center(image, angle):
     return rot_image
 
 
+class RotationCache:
+    """
+    Memoizes rot_center results, keyed by source surface and the angle rounded to a
+    multiple of quantum degrees. Holds at most max_size rotations, evicting the least
+    recently used. The source surface is keyed by identity, so it must not be drawn on
+    after it has been rotated through the cache.
+    """
+
+    def __init__(self, quantum=1, max_size=720):
+        self.quantum = quantum
+        self.max_size = max_size
+        self.rotations = OrderedDict()
+
+    def rot_center(self, image, angle):
+        step = int(round(angle / self.quantum))
+        key = (image, step)
+        try:
+            rot_image = self.rotations.pop(key)
+        except KeyError:
+            rot_image = rot_center(image, step * self.quantum)
+        self.rotations[key] = rot_image
+        if len(self.rotations) > self.max_size:
+            self.rotations.popitem(last=False)
+        return rot_image
+
+    def evict(self, image=None):
+        """
+        Drops the cached rotations of image, or of every surface if image is None
+        """
+        if image is None:
+            self.rotations.clear()
+        else:
+            for key in [k for k in self.rotations if k[0] is image]:
+                del self.rotations[key]
+
+    def __len__(self):
+        return len(self.rotations)
+
+
+# shared cache for sprites that rotate a fixed image every frame
+rotations = RotationCache()
+
+
+def segment_rect_entry(start, end, rect):
+    """
+    Slab test of the segment from start to end against rect (x, y, w, h), edges included.
+    Returns the fraction of the way along the segment at which it first enters rect
+    (0 if start is already inside), or None if the segment misses it.
+    """
+    t_enter, t_exit = 0.0, 1.0
+    for p, d, low, high in ((start[0], end[0] - start[0], rect[0], rect[0] + rect[2]),
+                            (start[1], end[1] - start[1], rect[1], rect[1] + rect[3])):
+        if d == 0:
+            if p < low or p > high:
+                return None
+            continue
+        t0 = (low - p) / float(d)
+        t1 = (high - p) / float(d)
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_enter:
+            t_enter = t0
+        if t1 < t_exit:
+            t_exit = t1
+        if t_enter > t_exit:
+            return None
+    return t_enter
+
+
+# batches at least this big go through numpy in ray_rect_hits, when it is available
+RAY_VECTORIZE_MIN = 32
+
+
+def ray_rect_hits(origin, direction, rects, vectorize=None):
+    """
+    Slab test of the ray origin + t * direction, for t from 0 to 1, against a batch of rects
+    (x, y, w, h). Returns an (index, t) pair for each rect the ray enters, where t is the
+    entry distance as a fraction of direction, nearest first. vectorize forces the numpy
+    path on or off; by default it is used for batches of RAY_VECTORIZE_MIN rects or more.
+    """
+    if vectorize is None:
+        vectorize = np is not None and len(rects) >= RAY_VECTORIZE_MIN
+    if not vectorize:
+        end = (origin[0] + direction[0], origin[1] + direction[1])
+        hits = []
+        for i, rect in enumerate(rects):
+            t = segment_rect_entry(origin, end, rect)
+            if t is not None:
+                hits.append((i, t))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    if not len(rects):
+        return []
+    rects = np.asarray(rects, dtype=float).reshape(-1, 4)
+    o = np.array(origin[:2], dtype=float)
+    d = np.array(direction[:2], dtype=float)
+    low = rects[:, :2]
+    high = low + rects[:, 2:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t0 = (low - o) / d
+        t1 = (high - o) / d
+    t_near = np.minimum(t0, t1)
+    t_far = np.maximum(t0, t1)
+    # an axis the ray doesn't move along either always or never overlaps the slab
+    still = d == 0
+    inside = (o >= low) & (o <= high)
+    t_near = np.where(still, np.where(inside, -np.inf, np.inf), t_near)
+    t_far = np.where(still, np.where(inside, np.inf, -np.inf), t_far)
+    t_enter = np.maximum(t_near.max(axis=1), 0.0)
+    t_exit = np.minimum(t_far.min(axis=1), 1.0)
+    hit = np.nonzero(t_enter <= t_exit)[0]
+    order = hit[np.argsort(t_enter[hit], kind='stable')]
+    return [(int(i), float(t_enter[i])) for i in order]
+
+
+class SpatialHash:
+    """
+    Uniform grid of square cells, each listing the items whose rect overlaps it, so that
+    the items near a rect can be found without testing every item. Rebuild it (or insert
+    and remove items) whenever the items move.
+    """
+
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cell_range(self, rect):
+        x, y, w, h = rect
+        size = self.cell_size
+        return (int(x // size), int((x + max(w, 1) - 1) // size),
+                int(y // size), int((y + max(h, 1) - 1) // size))
+
+    def insert(self, item, rect):
+        x0, x1, y0, y1 = self.cell_range(rect)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = [item]
+                else:
+                    cell.append(item)
+
+    def remove(self, item, rect):
+        x0, x1, y0, y1 = self.cell_range(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell and item in cell:
+                    cell.remove(item)
+
+    def rebuild(self, sprites):
+        """
+        Replaces the contents with sprites, filed by their rect
+        """
+        self.cells.clear()
+        insert = self.insert
+        for sprite in sprites:
+            insert(sprite, sprite.rect)
+
+    def query(self, rect):
+        """
+        Returns the items filed in any cell rect overlaps, each once. These are only
+        candidates: the caller still has to test them.
+        """
+        x0, x1, y0, y1 = self.cell_range(rect)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return list(cells.get((x0, y0), ()))
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(dict.fromkeys(cell))
+        return list(found)
+
+    def clear(self):
+        self.cells.clear()
+
+
 class Vector2D:
+    # no per-instance dict: vectors are created and updated for every entity every tick
+    __slots__ = ('x', 'y')
 
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
     def __add__(self, other):
-        if isinstance(other, Vector2D):
-            x = self.x + other.x
-            y = self.y + other.y
-            return Vector2D(x, y)
+        if type(other) is Vector2D or isinstance(other, Vector2D):
+            return Vector2D(self.x + other.x, self.y + other.y)
         elif isinstance(other, Number):
-            x = self.x + other
-            y = self.y + other
-            return Vector2D(x, y)
+            return Vector2D(self.x + other, self.y + other)
         else:
             raise TypeError("Other must be a scalar or Vector2D")
 
     def __sub__(self, other):
-        if isinstance(other, Vector2D):
-            x = self.x - other.x
-            y = self.y - other.y
-            return Vector2D(x, y)
+        if type(other) is Vector2D or isinstance(other, Vector2D):
+            return Vector2D(self.x - other.x, self.y - other.y)
         elif isinstance(other, Number):
-            x = self.x - other
-            y = self.y - other
-            return Vector2D(x, y)
+            return Vector2D(self.x - other, self.y - other)
         else:
             raise TypeError("Other must be a scalar or Vector2D")
 
     def __iadd__(self, other):
-        if isinstance(other, Vector2D):
+        if type(other) is Vector2D or isinstance(other, Vector2D):
             self.x += other.x
             self.y += other.y
             return self
@@ -56,7 +238,7 @@ class Vector2D:
             raise TypeError("Other must be a scalar or Vector2D")
 
     def __isub__(self, other):
-        if isinstance(other, Vector2D):
+        if type(other) is Vector2D or isinstance(other, Vector2D):
             self.x -= other.x
             self.y -= other.y
             return self
@@ -80,19 +262,45 @@ class Vector2D:
 
     # Scalar operations, other must be a scalar
     def __mul__(self, other):
-        if not isinstance(other, Number):
-            raise TypeError("Other must be a scalar")
-        return Vector2D(other * self.x, other * self.y)
+        if type(other) is float or type(other) is int or isinstance(other, Number):
+            return Vector2D(other * self.x, other * self.y)
+        raise TypeError("Other must be a scalar")
+
+    def __rmul__(self, other):
+        if type(other) is float or type(other) is int or isinstance(other, Number):
+            return Vector2D(other * self.x, other * self.y)
+        raise TypeError("Other must be a scalar")
+
+    def __imul__(self, other):
+        if type(other) is float or type(other) is int or isinstance(other, Number):
+            self.x *= other
+            self.y *= other
+            return self
+        raise TypeError("Other must be a scalar")
+
+    def __truediv__(self, other):
+        if type(other) is float or type(other) is int or isinstance(other, Number):
+            return Vector2D(self.x / other, self.y / other)
+        raise TypeError("Other must be a scalar")
 
     def __div__(self, other):
         if not isinstance(other, Number):
             raise TypeError("Other must be a scalar")
         return Vector2D(self.x.__truediv__(other), self.y.__truediv__(other))
 
-    def __rmul__(self, other):
-        if not isinstance(other, Number):
-            raise TypeError("Other must be a scalar")
-        return Vector2D(other * self.x, other * self.y)
+    # In-place operations that don't allocate, for per-tick updates
+    def add_scaled_ip(self, other, scale):
+        """
+        Adds other * scale to this vector in place, e.g. v.add_scaled_ip(a, dt)
+        """
+        self.x += other.x * scale
+        self.y += other.y * scale
+        return self
+
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
 
     def __str__(self):
         return str([self.x, self.y])
@@ -119,10 +327,10 @@ class Vector2D:
         return angle
 
     def __iter__(self):
-        return [self.x, self.y].__iter__()
+        return iter((self.x, self.y))
 
     def dot(self, other):
-        if isinstance(other, Vector2D):
+        if type(other) is Vector2D or isinstance(other, Vector2D):
             return self.x*other.x + self.y*other.y
         else:
             raise TypeError("Other must be a Vector2D")
@@ -156,29 +364,191 @@ class Vector2D:
         :return: Angle between the two vectors, where 0 means they point in the same direction
         -90 means v2 points to the west of v1, etc. 0 is returned if either is a zero vector.
         """
-        if v1 == Vector2D.zero() or v2 == Vector2D.zero():
+        x1, y1 = v1.x, v1.y
+        x2, y2 = v2.x, v2.y
+        if (x1 == 0 and y1 == 0) or (x2 == 0 and y2 == 0):
             return 0
-        # Use dot product to find angle
-        angle = math.acos(Vector2D.dot(v1, v2) / (v1.length() * v2.length()))
-
-        v1_angle = v1.angle()
-        v2_angle = v2.angle()
-
-        if v1_angle >= 0:
-            if v2_angle < v1_angle:
-                return -angle if v2_angle > v1_angle - math.pi else angle
-            else:
-                return angle
-        else:
-            if v2_angle > v1_angle:
-                return angle if v2_angle <= v1_angle + math.pi else -angle
-            else:
-                return -angle
+        # signed angle from the cross (sine) and dot (cosine) products
+        return math.atan2(x1 * y2 - y1 * x2, x1 * x2 + y1 * y2)
 
     def tuple(self):
         return (self.x, self.y)
 
 
+class Vector2DArray:
+    """
+    A batch of 2D vectors, stored as the rows of an (N, 2) float numpy array, with the
+    operations of Vector2D applied element-wise. Vector operands (+, -, dot) may be another
+    Vector2DArray of the same length, or a single Vector2D or (x, y) pair applied to every
+    row. Scalar operands (*, /) may be a scalar or an array of N scalars, one per row.
+    Slicing gives a view that shares memory with this array, so
+    in-place operations on a slice update the original; indexing one row gives a Vector2D.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        if np is None:
+            raise ImportError("Vector2DArray needs numpy")
+        # no copy when data already is a float array of the right shape
+        self.data = np.asarray(data, dtype=float).reshape(-1, 2)
+
+    @staticmethod
+    def zeros(n):
+        return Vector2DArray(np.zeros((n, 2)))
+
+    @staticmethod
+    def from_vectors(vectors):
+        return Vector2DArray([(v.x, v.y) for v in vectors])
+
+    @staticmethod
+    def create_from_angle(angle, length):
+        """
+        Element-wise Vector2D.create_from_angle: angle (radians) and length may each be a
+        scalar or an array of N values.
+        """
+        angle, length = np.broadcast_arrays(np.asarray(angle, dtype=float), np.asarray(length, dtype=float))
+        return Vector2DArray(np.stack((length * np.cos(angle), length * np.sin(angle)), axis=-1))
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @x.setter
+    def x(self, value):
+        self.data[:, 0] = value
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @y.setter
+    def y(self, value):
+        self.data[:, 1] = value
+
+    def _operand(self, other):
+        if isinstance(other, Vector2DArray):
+            return other.data
+        elif isinstance(other, Vector2D):
+            return np.array((other.x, other.y), dtype=float)
+        elif isinstance(other, Number):
+            return other
+        return np.asarray(other, dtype=float)
+
+    def _scalar(self, other):
+        if isinstance(other, (Vector2D, Vector2DArray)):
+            raise TypeError("Other must be a scalar or an array of scalars")
+        other = self._operand(other)
+        # one scalar per row
+        return other[:, None] if np.ndim(other) == 1 else other
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        rows = self.data[index]
+        if rows.ndim == 1:
+            return Vector2D(float(rows[0]), float(rows[1]))
+        return Vector2DArray(rows)
+
+    def __setitem__(self, index, value):
+        self.data[index] = self._operand(value)
+
+    def __iter__(self):
+        for x, y in self.data:
+            yield Vector2D(float(x), float(y))
+
+    def __add__(self, other):
+        return Vector2DArray(self.data + self._operand(other))
+
+    def __radd__(self, other):
+        return Vector2DArray(self._operand(other) + self.data)
+
+    def __sub__(self, other):
+        return Vector2DArray(self.data - self._operand(other))
+
+    def __rsub__(self, other):
+        return Vector2DArray(self._operand(other) - self.data)
+
+    def __iadd__(self, other):
+        self.data += self._operand(other)
+        return self
+
+    def __isub__(self, other):
+        self.data -= self._operand(other)
+        return self
+
+    def __neg__(self):
+        return Vector2DArray(-self.data)
+
+    # Scalar operations, other must be a scalar or an array of N scalars
+    def __mul__(self, other):
+        return Vector2DArray(self.data * self._scalar(other))
+
+    def __rmul__(self, other):
+        return Vector2DArray(self._scalar(other) * self.data)
+
+    def __imul__(self, other):
+        self.data *= self._scalar(other)
+        return self
+
+    def __truediv__(self, other):
+        return Vector2DArray(self.data / self._scalar(other))
+
+    def __itruediv__(self, other):
+        self.data /= self._scalar(other)
+        return self
+
+    __div__ = __truediv__
+    __idiv__ = __itruediv__
+
+    def add_scaled_ip(self, other, scale):
+        """
+        Adds other * scale to every row in place, e.g. positions.add_scaled_ip(velocities, dt)
+        """
+        self.data += self._operand(other) * self._scalar(scale)
+        return self
+
+    def __str__(self):
+        return str(self.data.tolist())
+
+    def __repr__(self):
+        return "Vector2DArray({0})".format(self.data.tolist())
+
+    def copy(self):
+        return Vector2DArray(self.data.copy())
+
+    def dot(self, other):
+        return (self.data * self._operand(other)).sum(axis=-1)
+
+    def length(self):
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+
+    def angle(self):
+        """
+        Element-wise Vector2D.angle, in radians from the x-axis
+        """
+        x, y = self.data[:, 0], self.data[:, 1]
+        angle = np.arctan2(y, x)
+        angle = np.where(y == 0, np.where(x > 0, 0.0, math.pi), angle)
+        return np.where(x == 0, np.where(y > 0, math.pi/2, -math.pi/2), angle)
+
+    @staticmethod
+    def angle_between(v1, v2):
+        """
+        Element-wise Vector2D.angle_between: the signed angle of v2 w.r.t v1, 0 where either
+        is a zero vector. Either argument may be a single Vector2D.
+        """
+        if isinstance(v1, Vector2D):
+            v1 = Vector2DArray([(v1.x, v1.y)])
+        if isinstance(v2, Vector2D):
+            v2 = Vector2DArray([(v2.x, v2.y)])
+        x1, y1 = v1.data[:, 0], v1.data[:, 1]
+        x2, y2 = v2.data[:, 0], v2.data[:, 1]
+        angle = np.arctan2(x1 * y2 - y1 * x2, x1 * x2 + y1 * y2)
+        zero = ((x1 == 0) & (y1 == 0)) | ((x2 == 0) & (y2 == 0))
+        return np.where(zero, 0.0, angle)
+
+
 class Vector3D:
 
     def __init__(self, x, y, z):
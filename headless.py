@@ -0,0 +1,109 @@
+"""
+Headless runner for the Tanks scene
+
+Steps the game logic of scenes.Tanks with no window, no audio and no image
+decoding, driven by a scripted mouse, e.g. to load-test wave escalation or
+to time the logic apart from rendering:
+
+    python headless.py 10000
+"""
+import sys
+import time
+import random
+import collections
+import numpy as np
+import pygame
+import utilities
+import tanks
+from scenes import Tanks
+
+
+class ScriptedInput(object):
+    """stands in for pygame.mouse, replaying a script of mouse states
+
+    script(tick) returns (pos, pressed) for the given tick, where pressed is
+    whether the left button is held. Presses and releases are turned into the
+    MOUSEBUTTONDOWN/UP events the scene expects from the event queue.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.pos = (0, 0)
+        self.pressed = False
+
+    def advance(self, tick):
+        pos, pressed = self.script(tick)
+        events = []
+        if pressed and not self.pressed:
+            events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=pos))
+        elif self.pressed and not pressed:
+            events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=pos))
+        self.pos = pos
+        self.pressed = pressed
+        return events
+
+    def get_pos(self):
+        return self.pos
+
+    def get_pressed(self):
+        return (self.pressed, False, False)
+
+
+def fire_at(target, period=30, hold=10):
+    """script that holds the button for hold ticks every period ticks, aiming at target"""
+    def script(tick):
+        return target, tick % period < hold
+    return script
+
+
+def run(ticks, script=None, seed=None, size=(320, 240), step=1.0/60):
+    """step a fresh Tanks scene for up to ticks ticks and report what happened
+
+    The run stops early if the tank is overrun. Nothing is saved to the
+    high-score file.
+    """
+    utilities.set_headless(size)
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    sim_clock = utilities.sim_clock
+    sim_clock.step = step
+    # report this run's pool traffic only
+    tanks.reset_pool_stats()
+
+    mouse = ScriptedInput(script or fire_at((size[0] // 2, size[1] // 2)))
+    scene = Tanks(mouse=mouse, save_file=None)
+    scene.initGraphics(None)
+    pressed_keys = collections.defaultdict(bool)
+
+    max_baddies = 0
+    start = time.time()
+    tick = 0
+    while tick < ticks and scene.next is scene:
+        scene.ProcessInput(mouse.advance(tick), pressed_keys)
+        sim_clock.tick()
+        scene.Update()
+        max_baddies = max(max_baddies, len(scene.baddies))
+        tick += 1
+    elapsed = time.time() - start
+
+    report = {'ticks': tick,
+              'seconds': elapsed,
+              'ticks_per_second': tick / elapsed if elapsed else float('inf'),
+              'game_time': tick * step,
+              'overrun': scene.next is not scene,
+              'score': scene.score,
+              'baddies': len(scene.baddies),
+              'max_baddies': max_baddies,
+              'baddie_queue': len(scene.baddie_queue),
+              'baddie_queue_bytes': scene.baddie_queue.nbytes(),
+              'pools': tanks.pool_stats()}
+    scene.releaseSprites()
+    return report
+
+
+if __name__ == '__main__':
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report = run(ticks, seed=0)
+    for key in sorted(report):
+        print('{0}: {1}'.format(key, report[key]))
@@ -1,5 +1,6 @@
 import pygame
 from scenes import *
+import utilities
 import os
 
 # -------- For PiTFT calibration --------
@@ -15,8 +16,16 @@ def run_game(width, height, fps, starting_scene):
     screen = pygame.display.set_mode((width, height))
     clock = pygame.time.Clock()
 
+    # the game logic runs at a fixed rate of fps steps per second of simulation
+    # time, however many frames actually get rendered
+    sim_clock = utilities.sim_clock
+    sim_clock.step = 1.0 / fps
+    elapsed = sim_clock.step
+
     active_scene = starting_scene
     paused = None
+    # the Tanks game being played, if any, so its sprites go back to the pools when it's left
+    game = None
 
     while active_scene:
 
@@ -56,14 +65,25 @@ def run_game(width, height, fps, starting_scene):
                 filtered_events.append(event)
 
         active_scene.ProcessInput(filtered_events, pressed_keys)
-        active_scene.Update()
+        for step in range(sim_clock.advance(elapsed)):
+            sim_clock.tick()
+            active_scene.Update()
+            if active_scene.next is not active_scene:
+                break
         active_scene.Render()
+        active_scene.Present()
 
         # print(active_scene.next)
+        if active_scene.next is not active_scene and active_scene.next is not None:
+            active_scene.next.Enter()
         active_scene = active_scene.next
+        if isinstance(active_scene, Tanks):
+            game = active_scene
+        elif isinstance(active_scene, Start) and game is not None:
+            game.releaseSprites()
+            game = None
 
-        pygame.display.flip()
-        clock.tick(fps)
+        elapsed = clock.tick(fps) / 1000.0
 
 #==============================================================================
 # The rest is code where you implement your game using the Scenes model
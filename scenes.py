@@ -3,7 +3,6 @@ import utilities
 import geometry as geo
 from tanks import *
 import math, random
-import time
 import colors
 
 class SceneBase:
@@ -25,6 +24,15 @@ class SceneBase:
     def Render(self):
         print("uh-oh, you didn't override this in the child class")
 
+    # shows the frame drawn by Render, called once per frame by the main loop
+    def Present(self):
+        pygame.display.flip()
+
+    # called by the main loop each time the scene becomes the active one,
+    # including when it is returned to after a pause
+    def Enter(self):
+        pass
+
     def SwitchToScene(self, next_scene):
         self.next = next_scene
 
@@ -41,7 +49,7 @@ class BallScene(SceneBase):
         self.a = geo.Vector2D(0, 1)
         self.elasticity = 0.8
         self.friction = 0.1
-        self.starttime = time.time()
+        self.starttime = utilities.now()
 
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
@@ -69,7 +77,7 @@ class BallScene(SceneBase):
         screenWidth, screenHeight = info.current_w, info.current_h
 
         # follow mouse drag
-        if time.time() - self.starttime > self.DELAY and click[0]:
+        if utilities.now() - self.starttime > self.DELAY and click[0]:
             currentPos = geo.Vector2D(*mouse)
             self.v = currentPos - self.lastPos
             self.lastPos = currentPos
@@ -109,7 +117,6 @@ class BallScene(SceneBase):
         self.screen.fill((255, 255, 255))
         self.screen.blit(self.ball, self.ballrect)
         self.screen.blit(self.obj, self.objrect)
-        pygame.display.flip()
 
 
 class Start(SceneBase):
@@ -120,7 +127,7 @@ class Start(SceneBase):
 
         self.options = ['Start', 'Test', 'Quit']
         self.buttons = pygame.sprite.Group()
-        self.starttime = time.time()
+        self.starttime = utilities.now()
 
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
@@ -128,7 +135,7 @@ class Start(SceneBase):
         info = pygame.display.Info()
         screenWidth, screenHeight = info.current_w, info.current_h
 
-        font = pygame.font.Font('freesansbold.ttf', 20)
+        font = utilities.load_font('freesansbold.ttf', 20)
 
         for i, option in enumerate(self.options):
             rect = pygame.Rect(int(screenWidth/2) - 50, int(screenHeight/2) - 100 + i*50, 100, 30)
@@ -153,14 +160,13 @@ class Start(SceneBase):
         pass
 
     def Update(self):
-        if time.time() - self.starttime < self.BUTTON_DELAY:
+        if utilities.now() - self.starttime < self.BUTTON_DELAY:
             return
         self.buttons.update()
 
     def Render(self):
         self.screen.fill(colors.WHITE)
         self.buttons.draw(self.screen)
-        pygame.display.flip()
 
 
 class Button(pygame.sprite.Sprite):
@@ -198,7 +204,7 @@ class Button(pygame.sprite.Sprite):
             self.renderButtonText(self.passive_text, self.passive_textcolor)
 
     def renderButtonText(self, text, color):
-        textsurf = self.font.render(text, True, color)
+        textsurf = utilities.render_text(self.font, text, color)
         textrect = textsurf.get_rect()
         # Put text in the middle of button
         textrect.left = self.rect.width/2 - textrect.width/2
@@ -212,42 +218,69 @@ class Tanks(SceneBase):
     BAT_RESPAWN_TIME = 30
     RUNNER_RESPAWN_TIME = 45
     MAX_ZOMBIES = 5
-
-    def __init__(self):
+    # redraw only the rects that changed and present them with display.update,
+    # set to False to fall back to a full redraw and flip for debugging
+    DIRTY_RECTS = False
+    # past this many rects, or this fraction of the screen once merged, tracking them
+    # costs more than a full redraw and flip, as in pygame.sprite.LayeredDirty
+    DIRTY_RECT_LIMIT = 32
+    DIRTY_AREA_LIMIT = 0.5
+
+    def __init__(self, dirty_rects=None, mouse=pygame.mouse, save_file='score.save'):
         SceneBase.__init__(self)
+        # anything with pygame.mouse's get_pos/get_pressed, so input can be scripted
+        self.mouse = mouse
+        self.save_file = save_file
+        self.dirty_rects = self.DIRTY_RECTS if dirty_rects is None else dirty_rects
+        self.drawn_rects = []
+        self.dirty = None
+        self.full_redraw = True
         self.gravity = geo.Vector2D(0, 1)
         self.elasticity = 0.8
         self.friction = 0.1
         self.tank = (Tank((0, 0), (255, 0, 0)))
         self.projectiles = pygame.sprite.Group()
+        self.projectile_system = ProjectileSystem()
         self.explosions = []
         self.baddies = pygame.sprite.Group()
+        self.enemy_system = EnemySystem()
+        # broadphase grids, so a projectile is only tested against what is near it
+        self.baddie_grid = geo.SpatialHash(cell_size=32)
+        self.balloon_grid = geo.SpatialHash(cell_size=32)
         self.score = 0
-        self.baddie_queue = []
+        # zombies waiting to come on, two for every one killed
+        self.baddie_queue = Backlog()
         self.balloons = pygame.sprite.Group()
-        self.startTime = time.time()
-        self.lastBalloonSpawnTime = self.startTime
-        self.timeOfLastAdd = {}
-        self.timeOfLastAdd['bats'] = time.time()
-        self.timeOfLastAdd['zombies'] = time.time()
-        self.timeOfLastAdd['runners'] = time.time()
+        self.startTime = utilities.now()
+        # when the next of each kind of baddie and the next balloon come on, see spawn()
+        self.spawns = utilities.Scheduler()
+        self.spawns.schedule(self.startTime + self.BALLOON_SPAWN_TIME, 'balloons')
+        # bats hold off for the first 30 seconds and runners for the first minute
+        self.spawns.schedule(self.startTime + max(30, self.BAT_RESPAWN_TIME), 'bats')
+        self.spawns.schedule(self.startTime + max(60, self.RUNNER_RESPAWN_TIME), 'runners')
         self.speeds = {}
         self.speeds['zombies'] = 0.3
         self.speeds['bats'] = 0.5
         self.speeds['runners'] = 2
         self.bomb = None
-        self.highscore = self.loadScore('score.save')
+        self.highscore = self.loadScore(save_file) if save_file else 0
 
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
+        # load everything the entities use up front so shots don't hit the disk
+        utilities.preload(images=['ball.png', 'green_balloon.png', 'blue_balloon.png', 'red_balloon.png'],
+                          sounds=['cannon.wav', 'explosion.wav', 'bomb.wav', 'bullet.wav', 'laser.wav',
+                                  'balloon_pop.wav'])
+        bake_explosions()
+
         # add first zombie, for some reason this needs to be here
-        zombie = Zombie(self.speeds['zombies'])
-        self.baddies.add(zombie)
-        self.timeOfLastAdd['zombies'] = time.time()
+        zombie = acquire(Zombie, self.speeds['zombies'])
+        self.addBaddie(zombie)
+        self.spawns.schedule(utilities.now() + self.ZOMBIE_RESPAWN_TIME, 'zombies')
 
-        self.scoreText = pygame.font.Font('freesansbold.ttf', 30)
-        self.highscoreText = pygame.font.Font('freesansbold.ttf', 12)
+        self.scoreText = utilities.load_font('freesansbold.ttf', 30)
+        self.highscoreText = utilities.load_font('freesansbold.ttf', 12)
 
     def ProcessInput(self, events, pressed_keys):
         for event in events:
@@ -260,7 +293,7 @@ class Tanks(SceneBase):
                             p = self.bomb = p1.shoot()
                         else:
                             p = p1.shoot()
-                        self.projectiles.add(p)
+                        self.addProjectile(p)
                     else:
                         self.bomb = None
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -269,6 +302,7 @@ class Tanks(SceneBase):
                 if self.bomb:
                     bomb = self.bomb
                     bomb.kill_on_explode = True
+                    self.baddie_grid.rebuild(self.baddies)
                     self.killBaddies(bomb)
 
                 p1.power = 0.5
@@ -279,11 +313,10 @@ class Tanks(SceneBase):
                     self.SwitchToScene(Pause(self))
 
     def Update(self):
-        mouse = pygame.mouse.get_pos()
-        pressed = pygame.mouse.get_pressed()
+        mouse = self.mouse.get_pos()
+        pressed = self.mouse.get_pressed()
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = utilities.screen_size()
 
         if pressed[0]:
             p1 = self.tank
@@ -297,11 +330,11 @@ class Tanks(SceneBase):
                     p1.power_dir *= -1
                     p1.power = 0.5
             elif p1.weapon == Weapon.MACHINE_GUN:
-                if time.time() - p1.lastShootTime > p1.MACHINE_GUN_RELOAD_TIME:
+                if utilities.now() - p1.lastShootTime > p1.MACHINE_GUN_RELOAD_TIME:
 
                     bullet = p1.shoot()
 
-                    self.projectiles.add(bullet)
+                    self.addProjectile(bullet)
 
         self.tank.v += self.gravity
         self.tank.rect.move_ip(*self.tank.v)
@@ -323,43 +356,28 @@ class Tanks(SceneBase):
 
         for baddy in collided_objects:
             if self.score > self.highscore:
-                self.saveScore('score.save')
+                if self.save_file:
+                    self.saveScore(self.save_file)
                 self.highscore = self.score
             self.SwitchToScene(Start())
 
-        for i, p in enumerate(self.projectiles):
+        if self.projectiles:
+            self.baddie_grid.rebuild(self.baddies)
+            self.balloon_grid.rebuild(self.balloons)
 
-            if type(p) is not Laser:
-                p.v += self.gravity
-                p.rect.move_ip(*p.v)
-            else:
-                if time.time() - self.tank.lastShootTime >= Laser.LASER_TIME:
-                    p.kill()
-
-            if p.rect.y > screenHeight - p.rect.height or p.rect.x < 0 or p.rect.x > screenWidth - p.rect.width:
-                if type(p) is not Bomb:
-                    self.explosions.append((p.explode(), p.pos()))
-                    p.kill()
-                else:
-                    if p.rect.y > screenHeight - p.rect.height:
-                        p.rect.y = screenHeight - p.rect.height
-                        p.v *= 0.9
-                    if p.rect.x > screenWidth - p.rect.width:
-                        p.rect.x = screenWidth - p.rect.width
-                        p.v.x *= -1
-                        p.v *= 0.5
-                    elif p.rect.x < 0:
-                        p.rect.x = 0
-                        p.v.x *= -1
-                        p.v *= 0.5
-
-                    if time.time() - p.start > Bomb.BOMB_FUSE_TIME:
-                        self.explosions.append((p.explode(), p.pos()))
-                        p.kill()
+        # every projectile in flight this tick is still tested for hits, even if it
+        # explodes or times out during the step
+        stepped = self.projectiles.sprites()
 
+        for event, p in self.projectile_system.step(self.gravity, screenWidth, screenHeight, utilities.now()):
+            if event == ProjectileSystem.EXPLODE:
+                self.explosions.append((p.explode(), p.pos()))
+            p.kill()
+
+        for p in stepped:
             self.killBaddies(p)
 
-            collided_objects = pygame.sprite.spritecollide(p, self.balloons, True, p.collided)
+            collided_objects = self.collideGrid(p, self.balloon_grid)
 
             for balloon in collided_objects:
                 self.explosions.append((p.explode(), p.pos()))
@@ -379,29 +397,41 @@ class Tanks(SceneBase):
 
                 self.incrementScore(5)
 
-        if time.time() - self.timeOfLastAdd['zombies'] > self.ZOMBIE_RESPAWN_TIME:
+        for when, kind in self.spawns.due(utilities.now()):
+            self.spawn(kind, when)
+
+        self.enemy_system.step(screenWidth)
+        self.balloons.update()
+
+    def spawn(self, kind, when):
+        """bring on the baddie or balloon kind that was due at when, and schedule the next"""
+        now = utilities.now()
+        screenWidth, screenHeight = utilities.screen_size()
+
+        if kind == 'zombies':
             if len(self.baddie_queue) > 0 and len(self.baddies) < self.MAX_ZOMBIES:
-                baddy = self.baddie_queue.pop(0)
-                self.baddies.add(baddy)
-                self.timeOfLastAdd['zombies'] = time.time()
-
-        if time.time() - self.startTime > 30:
-            if time.time() - self.timeOfLastAdd['bats'] > self.BAT_RESPAWN_TIME:
-                self.BAT_RESPAWN_TIME *= 0.95
-                self.speeds['bats'] *= 1.1
-                bat = Bat(self.speeds['bats'])
-                self.baddies.add(bat)
-                self.timeOfLastAdd['bats'] = time.time()
-
-        if time.time() - self.startTime > 60:
-            if time.time() - self.timeOfLastAdd['runners'] > self.RUNNER_RESPAWN_TIME:
-                self.RUNNER_RESPAWN_TIME *= 0.9
-                self.speeds['runners'] *= 1.2
-                runner = Runner(self.speeds['runners'])
-                self.baddies.add(runner)
-                self.timeOfLastAdd['runners'] = time.time()
-
-        if time.time() - self.lastBalloonSpawnTime > self.BALLOON_SPAWN_TIME:
+                baddy = self.baddie_queue.pop()
+                self.addBaddie(baddy)
+                self.spawns.schedule(now + self.ZOMBIE_RESPAWN_TIME, kind)
+            else:
+                # still due, so it goes again as soon as there is a zombie and room for it
+                self.spawns.schedule(when, kind)
+
+        elif kind == 'bats':
+            self.BAT_RESPAWN_TIME *= 0.95
+            self.speeds['bats'] *= 1.1
+            bat = acquire(Bat, self.speeds['bats'])
+            self.addBaddie(bat)
+            self.spawns.schedule(now + self.BAT_RESPAWN_TIME, kind)
+
+        elif kind == 'runners':
+            self.RUNNER_RESPAWN_TIME *= 0.9
+            self.speeds['runners'] *= 1.2
+            runner = acquire(Runner, self.speeds['runners'])
+            self.addBaddie(runner)
+            self.spawns.schedule(now + self.RUNNER_RESPAWN_TIME, kind)
+
+        elif kind == 'balloons':
             pos = random.uniform(100, screenWidth - 100), random.uniform(screenHeight-100, screenHeight - 50)
 
             if self.score < 30:
@@ -412,17 +442,37 @@ class Tanks(SceneBase):
                 color_list = [colors.DARK_RED, colors.DARK_GREEN, colors.DARK_BLUE]
 
             color = random.choice(color_list)
-            balloon = Balloon(pos, color)
+            balloon = acquire(Balloon, pos, color)
 
             self.balloons.add(balloon)
-            self.lastBalloonSpawnTime = time.time()
-
-
-        self.baddies.update()
-        self.balloons.update()
+            self.spawns.schedule(now + self.BALLOON_SPAWN_TIME, kind)
+
+    def addBaddie(self, baddy):
+        self.baddies.add(baddy)
+        self.enemy_system.add(baddy)
+
+    def addProjectile(self, projectile):
+        self.projectiles.add(projectile)
+        self.projectile_system.add(projectile)
+
+    def releaseSprites(self):
+        """kill every baddie, projectile and balloon, handing them back to their pools"""
+        for group in (self.baddies, self.projectiles, self.balloons):
+            for sprite in group.sprites():
+                sprite.kill()
+
+    def collideGrid(self, projectile, grid):
+        """kills and returns the sprites filed in grid that projectile hits"""
+        collided_objects = projectile.hits([sprite for sprite in grid.query(projectile.reach()) if sprite.alive()])
+        for sprite in collided_objects:
+            sprite.kill()
+        if collided_objects:
+            # explode where the first of them was hit, not where the projectile ended the tick
+            projectile.stopAt(collided_objects)
+        return collided_objects
 
     def killBaddies(self, projectile):
-        collided_objects = pygame.sprite.spritecollide(projectile, self.baddies, True, projectile.collided)
+        collided_objects = self.collideGrid(projectile, self.baddie_grid)
         for baddy in collided_objects:
 
             self.explosions.append((projectile.explode(), projectile.pos()))
@@ -431,10 +481,7 @@ class Tanks(SceneBase):
             if type(baddy) is Zombie:
                 # add next zombie
                 self.speeds['zombies'] *= 1.01
-                zombie1 = Zombie(self.speeds['zombies'])
-                zombie2 = Zombie(self.speeds['zombies'])
-                self.baddie_queue.append(zombie1)
-                self.baddie_queue.append(zombie2)
+                self.baddie_queue.push(Zombie, self.speeds['zombies'], 2)
 
                 self.incrementScore(1)
             elif type(baddy) is Bat:
@@ -446,60 +493,90 @@ class Tanks(SceneBase):
         self.score += inc
 
     def Render(self):
-        self.screen.fill(colors.WHITE)
+        # drawn_rects is None when last frame drew too much to erase piece by piece
+        full = not self.dirty_rects or self.full_redraw or self.drawn_rects is None
+        if full:
+            self.screen.fill(colors.WHITE)
+        else:
+            # erase only what was drawn last frame
+            for rect in self.drawn_rects:
+                self.screen.fill(colors.WHITE, rect)
+
+        rects = []
 
-        scoreSurf = self.scoreText.render("Score: {0}".format(self.score), True, (0, 0, 0))
+        scoreSurf = utilities.render_text(self.scoreText, "Score: {0}".format(self.score), (0, 0, 0))
         scoreRect = scoreSurf.get_rect()
         scoreRect.center = 100, 50
-        self.screen.blit(scoreSurf, scoreRect)
+        rects.append(self.screen.blit(scoreSurf, scoreRect))
 
-        scoreSurf = self.highscoreText.render("High-score: {0}".format(self.highscore), True, (0, 0, 0))
+        scoreSurf = utilities.render_text(self.highscoreText, "High-score: {0}".format(self.highscore), (0, 0, 0))
         scoreRect = scoreSurf.get_rect()
         scoreRect.center = 100, 75
-        self.screen.blit(scoreSurf, scoreRect)
-
-        for i, tup in enumerate(self.explosions):
-            exp, pos = tup
-            if exp:
-                if exp.i < len(exp.images):
-                    img = exp.next()
-                    img = pygame.transform.scale(img, (50, 50))
-                    x, y, w, h = img.get_rect()
-                    pos = pos[0] - int(w/2), pos[1] - int(h/2)
-                    self.screen.blit(img, pos)
-                else:
-                    self.explosions.pop(i)
-            else:
-                self.explosions.pop(i)
+        rects.append(self.screen.blit(scoreSurf, scoreRect))
+
+        # drop finished explosions, the frames are already baked at their drawn size
+        self.explosions = [(exp, pos) for exp, pos in self.explosions if exp and exp.i < len(exp.images)]
+        for exp, pos in self.explosions:
+            if exp.i >= len(exp.images):
+                # a bomb that takes out several enemies lists its animation once per enemy
+                continue
+            img = exp.next()
+            x, y, w, h = img.get_rect()
+            pos = pos[0] - int(w/2), pos[1] - int(h/2)
+            rects.append(self.screen.blit(img, pos))
 
         for p in self.projectiles:
-            p.draw(self.screen)
+            rects.append(p.draw(self.screen))
 
-        self.tank.draw(self.screen)
+        rects.append(self.tank.draw(self.screen))
 
         self.baddies.draw(self.screen)
         self.balloons.draw(self.screen)
+        rects.extend(s.rect.copy() for s in self.baddies)
+        rects.extend(s.rect.copy() for s in self.balloons)
+
+        rects.append(self.drawCrossHairs())
+
+        erased = self.drawn_rects
+        self.drawn_rects = self.mergeDirty(rects) if self.dirty_rects else None
+        # the area to present is whatever was erased plus what was drawn this frame,
+        # or None to flip the whole screen
+        self.dirty = None if full or self.drawn_rects is None else self.mergeDirty(erased + self.drawn_rects)
+
+    def mergeDirty(self, rects):
+        """rects with the overlapping ones merged, or None if a full redraw would be cheaper"""
+        if len(rects) > self.DIRTY_RECT_LIMIT:
+            return None
+        merged = utilities.merge_rects(rects)
+        width, height = self.screen.get_size()
+        if sum(rect.w * rect.h for rect in merged) > self.DIRTY_AREA_LIMIT * width * height:
+            return None
+        return merged
+
+    def Present(self):
+        if self.dirty is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty)
+        self.full_redraw = False
 
-        self.drawCrossHairs()
-
-        pygame.display.flip()
+    def Enter(self):
+        # whatever was shown meanwhile drew over the screen, so repaint it all
+        self.full_redraw = True
 
     def drawCrossHairs(self):
-        mouse = pygame.mouse.get_pos()
-        pressed = pygame.mouse.get_pressed()
+        mouse = self.mouse.get_pos()
+        pressed = self.mouse.get_pressed()
 
         offset = 5
         length = 10
-        if pressed[0]:
-            pygame.draw.line(self.screen, colors.RED, (mouse[0], mouse[1] - offset), (mouse[0], mouse[1] - length))
-            pygame.draw.line(self.screen, colors.RED, (mouse[0], mouse[1] + offset), (mouse[0], mouse[1] + length))
-            pygame.draw.line(self.screen, colors.RED, (mouse[0] - offset, mouse[1]), (mouse[0] - length, mouse[1]))
-            pygame.draw.line(self.screen, colors.RED, (mouse[0] + offset, mouse[1]), (mouse[0] + length, mouse[1]))
-        else:
-            pygame.draw.line(self.screen, colors.BLACK, (mouse[0], mouse[1] - offset), (mouse[0], mouse[1] - length))
-            pygame.draw.line(self.screen, colors.BLACK, (mouse[0], mouse[1] + offset), (mouse[0], mouse[1] + length))
-            pygame.draw.line(self.screen, colors.BLACK, (mouse[0] - offset, mouse[1]), (mouse[0] - length, mouse[1]))
-            pygame.draw.line(self.screen, colors.BLACK, (mouse[0] + offset, mouse[1]), (mouse[0] + length, mouse[1]))
+        color = colors.RED if pressed[0] else colors.BLACK
+        rects = [pygame.draw.line(self.screen, color, (mouse[0], mouse[1] - offset), (mouse[0], mouse[1] - length)),
+                 pygame.draw.line(self.screen, color, (mouse[0], mouse[1] + offset), (mouse[0], mouse[1] + length)),
+                 pygame.draw.line(self.screen, color, (mouse[0] - offset, mouse[1]), (mouse[0] - length, mouse[1])),
+                 pygame.draw.line(self.screen, color, (mouse[0] + offset, mouse[1]), (mouse[0] + length, mouse[1]))]
+
+        return rects[0].unionall(rects[1:])
 
     def saveScore(self, filename):
         with open(filename, 'w') as f:
@@ -529,8 +606,8 @@ class CheckExit(SceneBase):
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
-        self.warningText = pygame.font.Font('freesansbold.ttf', 25)
-        font = pygame.font.Font('freesansbold.ttf', 20)
+        self.warningText = utilities.load_font('freesansbold.ttf', 25)
+        font = utilities.load_font('freesansbold.ttf', 20)
 
         info = pygame.display.Info()
         screenWidth, screenHeight = info.current_w, info.current_h
@@ -564,13 +641,12 @@ class CheckExit(SceneBase):
 
         info = pygame.display.Info()
         screenWidth, screenHeight = info.current_w, info.current_h
-        promptSurf = self.warningText.render("Quit without saving?", True, (0, 0, 0))
+        promptSurf = utilities.render_text(self.warningText, "Quit without saving?", (0, 0, 0))
         promptRect = promptSurf.get_rect()
         promptRect.center = screenWidth/2, 50
         self.screen.blit(promptSurf, promptRect)
 
         self.buttons.draw(self.screen)
-        pygame.display.flip()
 
 
 class Pause(SceneBase):
@@ -584,8 +660,8 @@ class Pause(SceneBase):
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
-        self.pauseText = pygame.font.Font('freesansbold.ttf', 25)
-        font = pygame.font.Font('freesansbold.ttf', 20)
+        self.pauseText = utilities.load_font('freesansbold.ttf', 25)
+        font = utilities.load_font('freesansbold.ttf', 20)
 
         info = pygame.display.Info()
         screenWidth, screenHeight = info.current_w, info.current_h
@@ -628,10 +704,9 @@ class Pause(SceneBase):
 
         info = pygame.display.Info()
         screenWidth, screenHeight = info.current_w, info.current_h
-        promptSurf = self.pauseText.render("PAUSED", True, (0, 0, 0))
+        promptSurf = utilities.render_text(self.pauseText, "PAUSED", (0, 0, 0))
         promptRect = promptSurf.get_rect()
         promptRect.center = screenWidth/2, 50
         self.screen.blit(promptSurf, promptRect)
 
         self.buttons.draw(self.screen)
-        pygame.display.flip()
@@ -3,11 +3,23 @@ import pygame
 import utilities
 import math
 import random
+import sys
+import collections
 from enum import Enum
-import time
+import numpy as np
 import colors
 
 
+# explosion frames are baked at this size once, not scaled on every draw
+EXPLOSION_SIZE = (50, 50)
+
+
+def bake_explosions():
+    """slice and scale the explosion strips ahead of the first impact"""
+    utilities.load_strip('explosion.png', (0, 0, 256, 256), (8, 7), colorkey=-1, size=EXPLOSION_SIZE)
+    utilities.load_strip('bomb.png', (0, 0, 60, 60), (12, 1), colorkey=-1, size=EXPLOSION_SIZE)
+
+
 class Weapon(Enum):
     CANNON = 0
     BOMB = 1
@@ -31,9 +43,15 @@ class Tank(pygame.sprite.Sprite):
         self.surface = pygame.Surface((60, 60))
         self.surface.set_colorkey(self.transparent)
         self.surface.fill(self.transparent)
+        # the gun is drawn once per facing and only rotated (through the cache) per frame
         self.gun = pygame.Surface((60, 60))
         self.gun.set_colorkey(self.transparent)
         self.gun.fill(self.transparent)
+        pygame.draw.rect(self.gun, self.color, (30, 30, 30, 5))
+        self.gun_left = pygame.Surface((60, 60))
+        self.gun_left.set_colorkey(self.transparent)
+        self.gun_left.fill(self.transparent)
+        pygame.draw.rect(self.gun_left, self.color, (0, 30, 30, 5))
         self.faceright = facing_right
         self.v = geo.Vector2D.zero()
         self.power = 0.5
@@ -41,8 +59,8 @@ class Tank(pygame.sprite.Sprite):
         self.power_speed = 0.03
         self.weapon = Weapon.CANNON
         self.ammo = 0
-        self.lastShootTime = time.time()
-        self.ammoText = pygame.font.Font('freesansbold.ttf', 8)
+        self.lastShootTime = utilities.now()
+        self.ammoText = utilities.load_font('freesansbold.ttf', 8)
 
         self.cannon_sound = utilities.load_sound("cannon.wav")
 
@@ -50,15 +68,12 @@ class Tank(pygame.sprite.Sprite):
         x, y, w, h = self.rect
 
         self.surface.fill(self.transparent)
-        self.gun.fill(self.transparent)
 
         # draw the tank gun
         if self.faceright:
-            pygame.draw.rect(self.gun, self.color, (30, 30, 30, 5))
-            gun = geo.rot_center(self.gun, self.angle)
+            gun = geo.rotations.rot_center(self.gun, self.angle)
         else:
-            pygame.draw.rect(self.gun, self.color, (0, 30, 30, 5))
-            gun = geo.rot_center(self.gun, -self.angle)
+            gun = geo.rotations.rot_center(self.gun_left, -self.angle)
         gun_rect = gun.get_rect()
         gun_rect[1] = gun_rect[1] + h/2 - 10
 
@@ -69,7 +84,7 @@ class Tank(pygame.sprite.Sprite):
             pygame.draw.rect(self.surface, (0, 255, 0), (5, h - 15 - int(self.power*10), 5, int(self.power*10)))
 
         if self.ammo > 0:
-            ammoSurf = self.ammoText.render("{0}".format(self.ammo), True, (0, 0, 0))
+            ammoSurf = utilities.render_text(self.ammoText, "{0}".format(self.ammo), (0, 0, 0))
             ammoRect = ammoSurf.get_rect()
             ammoRect.x, ammoRect.y = 5, 5
             self.surface.blit(ammoSurf, ammoRect)
@@ -78,10 +93,10 @@ class Tank(pygame.sprite.Sprite):
         pygame.draw.circle(self.surface, self.color, (int(w/2), h - 10), 10)
         pygame.draw.rect(self.surface, self.color, ((int(w/2) - 15), h - 10, 30, 10))
 
-        screen.blit(self.surface, self.rect)
-
         self.screen = screen
 
+        return screen.blit(self.surface, self.rect)
+
     def origin(self):
         x, y, w, h = self.rect
 
@@ -93,37 +108,36 @@ class Tank(pygame.sprite.Sprite):
         if self.weapon == Weapon.CANNON:
             ball_speed = 30
 
-            ball = Cannonball(pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
+            ball = acquire(Cannonball, pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
 
-            pygame.mixer.Sound.play(self.cannon_sound)
+            self.cannon_sound.play()
         else:
             if self.weapon == Weapon.BOMB:
                 ball_speed = 30
 
-                ball = Bomb(pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
+                ball = acquire(Bomb, pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
 
-                pygame.mixer.Sound.play(self.cannon_sound)
+                self.cannon_sound.play()
 
             elif self.weapon == Weapon.MACHINE_GUN:
                 ball_speed = 50
 
-                ball = Bullet(pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
+                ball = acquire(Bullet, pos, geo.Vector2D(self.power * ball_speed * math.cos(math.radians(self.angle)), -self.power * ball_speed * math.sin(math.radians(self.angle))))
 
-                pygame.mixer.Sound.play(ball.sound)
+                ball.sound.play()
             else:
-                info = pygame.display.Info()
-                screenWidth, screenHeight = info.current_w, info.current_h
+                screenWidth, screenHeight = utilities.screen_size()
 
-                ball = Laser(pos, geo.Vector2D(2*screenWidth*math.cos(math.radians(self.angle)), -2*screenHeight*math.sin(math.radians(self.angle))))
+                ball = acquire(Laser, pos, geo.Vector2D(2*screenWidth*math.cos(math.radians(self.angle)), -2*screenHeight*math.sin(math.radians(self.angle))))
 
-                pygame.mixer.Sound.play(ball.sound)
+                ball.sound.play()
 
             self.ammo -= 1
 
             if self.ammo == 0:
                 self.weapon = Weapon.CANNON
 
-        self.lastShootTime = time.time()
+        self.lastShootTime = utilities.now()
 
         return ball
 
@@ -140,13 +154,51 @@ class Tank(pygame.sprite.Sprite):
 
 
 class Projectile(pygame.sprite.Sprite):
+    # how far from its position the projectile hits a target
+    HIT_RADIUS = 15
+    # set while the projectile is handed out by a utilities.Pool
+    pool = None
 
     def __init__(self, pos, velocity):
         # Call the parent class (Sprite) constructor
         pygame.sprite.Sprite.__init__(self)
 
+        # set while a ProjectileSystem holds the velocity
+        self.system = None
         self.v = velocity
         self.initGraphics(pos)
+        # where the projectile was at the start of the tick, to sweep its path for hits
+        self.last = self.rect.topleft
+
+    def reset(self, pos, velocity):
+        """ready a pooled projectile to be fired again, keeping its graphics"""
+        self.v = velocity
+        self.rect.center = pos
+        self.last = self.rect.topleft
+
+    @property
+    def v(self):
+        """
+        The velocity. While a ProjectileSystem holds it this is a VelocityView, so
+        component writes like p.v.x *= -1 reach the system's arrays.
+        """
+        if self.system is not None:
+            return self.system.velocity(self)
+        return self._v
+
+    @v.setter
+    def v(self, velocity):
+        if self.system is not None:
+            self.system.setVelocity(self, velocity)
+        else:
+            self._v = velocity
+
+    def kill(self):
+        if self.system is not None:
+            self.system.remove(self)
+        pygame.sprite.Sprite.kill(self)
+        if self.pool is not None:
+            self.pool.release(self)
 
     def initGraphics(self, pos):
         self.img = pygame.Surface((5, 5))
@@ -154,7 +206,7 @@ class Projectile(pygame.sprite.Sprite):
         self.rect.center = pos
 
     def draw(self, screen):
-        screen.blit(self.img, self.rect)
+        return screen.blit(self.img, self.rect)
 
     def pos(self):
         return self.rect.center
@@ -162,17 +214,38 @@ class Projectile(pygame.sprite.Sprite):
     def explode(self):
         return None
 
+    def reach(self):
+        """the area in which collided() can hit a target, over the whole path since the last tick"""
+        radius = self.HIT_RADIUS
+        x, y = self.last
+        x2, y2 = self.rect.topleft
+        return pygame.Rect(min(x, x2) - radius, min(y, y2) - radius,
+                           abs(x2 - x) + 2*radius, abs(y2 - y) + 2*radius)
+
+    def sweep(self, target):
+        """
+        the fraction of the path since the last tick at which the projectile first came
+        within HIT_RADIUS of target, or None if it never did
+        """
+        x, y, w, h = target.rect
+        radius = self.HIT_RADIUS
+        return geo.segment_rect_entry(self.last, self.rect.topleft, (x - radius, y - radius, w + 2*radius, h + 2*radius))
+
+    def stopAt(self, targets):
+        """move back along the path to where the first of targets was hit"""
+        t = min(self.sweep(target) for target in targets)
+        x, y = self.last
+        x2, y2 = self.rect.topleft
+        self.rect.topleft = x + t*(x2 - x), y + t*(y2 - y)
+
+    def hits(self, targets):
+        """the targets this projectile hits"""
+        return [target for target in targets if self.collided(self, target)]
+
     @staticmethod
     def collided(left, right):
-        x, y, w, h = left.rect
-        x2, y2, w2, h2 = right.rect
-
-        radius = 15
-
-        if x + radius > x2 and x - radius < x2 + w2 and y + radius > y2 and y - radius < y2 + h2:
-            return True
-        else:
-            return False
+        # tests the path travelled since the last tick, so fast projectiles can't skip a target
+        return left.sweep(right) is not None
 
 
 class Cannonball(Projectile):
@@ -186,9 +259,9 @@ class Cannonball(Projectile):
         self.sound = utilities.load_sound('explosion.wav')
 
     def explode(self):
-        pygame.mixer.Sound.play(self.sound)
+        self.sound.play()
 
-        strips = utilities.SpriteStripAnim('explosion.png', (0, 0, 256, 256), (8,7), colorkey=-1, frames=1)
+        strips = utilities.SpriteStripAnim('explosion.png', (0, 0, 256, 256), (8,7), colorkey=-1, frames=1, size=EXPLOSION_SIZE)
         strips.iter()
 
         return strips
@@ -196,37 +269,42 @@ class Cannonball(Projectile):
 
 class Bomb(Projectile):
     BOMB_FUSE_TIME = 5
+    HIT_RADIUS = 30
+
     def initGraphics(self, pos):
-        self.strips = utilities.SpriteStripAnim('bomb.png', (0, 0, 60, 60), (12, 1), colorkey=-1, frames=5)
+        self.strips = utilities.SpriteStripAnim('bomb.png', (0, 0, 60, 60), (12, 1), colorkey=-1, frames=5, size=EXPLOSION_SIZE)
         self.strips.iter()
         self.img = self.strips.next()
         self.img = pygame.transform.scale(self.img, (5, 5))
         self.rect = self.img.get_rect()
         self.rect.center = pos
         self.sound = utilities.load_sound('bomb.wav')
-        self.start = time.time()
+        self.start = utilities.now()
+        self.kill_on_explode = False
+
+    def reset(self, pos, velocity):
+        Projectile.reset(self, pos, velocity)
+        # the last strip may still be playing as an explosion
+        self.strips = utilities.SpriteStripAnim('bomb.png', (0, 0, 60, 60), (12, 1), colorkey=-1, frames=5, size=EXPLOSION_SIZE)
+        self.strips.iter()
+        self.start = utilities.now()
         self.kill_on_explode = False
 
     def explode(self):
-        pygame.mixer.Sound.play(self.sound)
+        self.sound.play()
 
         return self.strips
 
     @staticmethod
     def collided(left, right):
-        x, y, w, h = left.rect
-        x2, y2, w2, h2 = right.rect
-
-        radius = 30
-
-        if x + radius > x2 and x - radius < x2 + w2 and y + radius > y2 and y - radius < y2 + h2:
-            if left.kill_on_explode or time.time() - left.start > Bomb.BOMB_FUSE_TIME:
+        if left.sweep(right) is not None:
+            if left.kill_on_explode or utilities.now() - left.start > Bomb.BOMB_FUSE_TIME:
                 return True
-        else:
-            return False
+        return False
 
 
 class Bullet(Projectile):
+    HIT_RADIUS = 3
 
     def initGraphics(self, pos):
         self.img = utilities.load_image('ball.png')
@@ -236,19 +314,7 @@ class Bullet(Projectile):
         self.sound = utilities.load_sound('bullet.wav')
 
     def explode(self):
-        pygame.mixer.Sound.play(self.sound)
-
-    @staticmethod
-    def collided(left, right):
-        x, y, w, h = left.rect
-        x2, y2, w2, h2 = right.rect
-
-        radius = 3
-
-        if x + radius > x2 and x - radius < x2 + w2 and y + radius > y2 and y - radius < y2 + h2:
-            return True
-        else:
-            return False
+        self.sound.play()
 
 
 class Laser(Projectile):
@@ -258,30 +324,292 @@ class Laser(Projectile):
         self.sound = utilities.load_sound('laser.wav')
 
     def draw(self, screen):
-        pygame.draw.line(screen, colors.RED, self.rect.topleft, (geo.Vector2D(*self.pos()) + self.v).tuple())
+        return pygame.draw.line(screen, colors.RED, self.rect.topleft, (geo.Vector2D(*self.pos()) + self.v).tuple())
 
-    @staticmethod
-    def collided(left, right):
+    def stopAt(self, targets):
+        # the beam goes through everything in its way
+        pass
 
-        topline = geo.Vector2D(*right.rect.topleft) - geo.Vector2D(*left.pos())
-        bottomline = geo.Vector2D(*right.rect.bottomleft) - geo.Vector2D(*left.pos())
+    def reach(self):
+        # the whole beam
+        x, y = self.pos()
+        rect = pygame.Rect(x, y, self.v.x, self.v.y)
+        rect.normalize()
+        return rect
 
-        if geo.Vector2D.angle_between(left.v, topline) < 0 < geo.Vector2D.angle_between(left.v, bottomline):
-            return True
+    def hits(self, targets):
+        # one batched ray test for the whole beam
+        return [targets[i] for i, t in geo.ray_rect_hits(self.pos(), self.v.tuple(), [target.rect for target in targets])]
+
+    @staticmethod
+    def collided(left, right):
+        return len(geo.ray_rect_hits(left.pos(), left.v.tuple(), [right.rect], vectorize=False)) > 0
+
+
+class VelocityView(geo.Vector2D):
+    """
+    A Vector2D that reads and writes the velocity row of a projectile held by a
+    ProjectileSystem. It follows the projectile rather than the row, so it stays
+    valid when the projectile's slot moves. Arithmetic gives plain Vector2D copies.
+    """
+    __slots__ = ('projectile',)
+
+    def __init__(self, projectile):
+        self.projectile = projectile
+
+    @property
+    def x(self):
+        p = self.projectile
+        return float(p.system.vel.data[p.slot, 0]) if p.system is not None else p._v.x
+
+    @x.setter
+    def x(self, value):
+        p = self.projectile
+        if p.system is not None:
+            p.system.vel.data[p.slot, 0] = value
         else:
-            return False
+            p._v.x = value
+
+    @property
+    def y(self):
+        p = self.projectile
+        return float(p.system.vel.data[p.slot, 1]) if p.system is not None else p._v.y
+
+    @y.setter
+    def y(self, value):
+        p = self.projectile
+        if p.system is not None:
+            p.system.vel.data[p.slot, 1] = value
+        else:
+            p._v.y = value
+
+
+class ProjectileSystem:
+    """
+    Holds the kinematics of every projectile in flight in contiguous arrays (positions,
+    velocities, kind, spawn time, size and hit radius), packed into the first count
+    slots, and steps them all at once. The sprites are only kept to draw and hit-test:
+    step() writes the new positions back into their rects.
+    """
+    EXPLODE = 'explode'
+    KILL = 'kill'
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.sprites = []
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        n = self.count
+        pos, vel = geo.Vector2DArray.zeros(capacity), geo.Vector2DArray.zeros(capacity)
+        size = np.zeros((capacity, 2))
+        kind = np.zeros(capacity, dtype=int)
+        spawn = np.zeros(capacity)
+        radius = np.zeros(capacity)
+        if n:
+            pos[:n] = self.pos[:n]
+            vel[:n] = self.vel[:n]
+            size[:n] = self.size[:n]
+            kind[:n] = self.kind[:n]
+            spawn[:n] = self.spawn[:n]
+            radius[:n] = self.radius[:n]
+        self.pos, self.vel, self.size, self.kind, self.spawn, self.radius = pos, vel, size, kind, spawn, radius
+
+    def add(self, projectile):
+        if self.count == len(self.kind):
+            self.allocate(2 * len(self.kind))
+        i = self.count
+        v = projectile.v
+        self.pos.data[i] = projectile.rect.topleft
+        self.vel.data[i] = v.x, v.y
+        self.size[i] = projectile.rect.size
+        self.kind[i] = PROJECTILE_KINDS[type(projectile)]
+        self.spawn[i] = utilities.now()
+        self.radius[i] = projectile.HIT_RADIUS
+        projectile.slot = i
+        projectile.system = self
+        self.sprites.append(projectile)
+        self.count += 1
+
+    def remove(self, projectile):
+        """drop projectile, moving the last one into its slot"""
+        i, last = projectile.slot, self.count - 1
+        projectile._v = projectile.v.copy()
+        projectile.system = None
+        if i != last:
+            moved = self.sprites[last]
+            for array in (self.pos.data, self.vel.data, self.size, self.kind, self.spawn, self.radius):
+                array[i] = array[last]
+            self.sprites[i] = moved
+            moved.slot = i
+        self.sprites.pop()
+        self.count = last
+
+    def velocity(self, projectile):
+        return VelocityView(projectile)
+
+    def setVelocity(self, projectile, velocity):
+        self.vel.data[projectile.slot] = velocity.x, velocity.y
+
+    def step(self, gravity, width, height, now):
+        """
+        Integrates gravity, bounces bombs off the floor and walls and finds what has left
+        the field, burnt its fuse or timed out. Returns (event, projectile) pairs, EXPLODE
+        or KILL, for the caller to act on.
+        """
+        n = self.count
+        if not n:
+            return []
+        pos, vel = self.pos.data[:n], self.vel.data[:n]
+        w, h = self.size[:n, 0], self.size[:n, 1]
+        kind, age = self.kind[:n], now - self.spawn[:n]
+
+        moving = kind != LASER
+        vel[moving] += (gravity.x, gravity.y)
+        pos[moving] += vel[moving]
+
+        x, y = pos[:, 0], pos[:, 1]
+        out = (y > height - h) | (x < 0) | (x > width - w)
+        bomb = kind == BOMB
+
+        # bombs bounce instead of exploding, and only go off once the fuse has burnt
+        floor = bomb & (y > height - h)
+        y[floor] = (height - h)[floor]
+        vel[floor] *= 0.9
+        right = bomb & (x > width - w)
+        left = bomb & ~right & (x < 0)
+        x[right] = (width - w)[right]
+        x[left] = 0
+        wall = right | left
+        vel[wall, 0] *= -1
+        vel[wall] *= 0.5
+
+        explode = out & (~bomb | (age > Bomb.BOMB_FUSE_TIME))
+        expire = (kind == LASER) & (age >= Laser.LASER_TIME)
+
+        for projectile, topleft in zip(self.sprites, pos.tolist()):
+            projectile.last = projectile.rect.topleft
+            projectile.rect.topleft = topleft
+
+        sprites = self.sprites
+        return [(self.EXPLODE, sprites[i]) for i in np.nonzero(explode)[0]] + \
+               [(self.KILL, sprites[i]) for i in np.nonzero(expire & ~explode)[0]]
+
+
+CANNONBALL, BOMB, BULLET, LASER = range(4)
+PROJECTILE_KINDS = {Cannonball: CANNONBALL, Bomb: BOMB, Bullet: BULLET, Laser: LASER}
 
 
 class Enemy(pygame.sprite.Sprite):
+    # how much the enemy wobbles up and down each tick (standard deviation, pixels)
+    JITTER = 0
+    # set while the enemy is handed out by a utilities.Pool
+    pool = None
+
     # Constructor. Pass in the color of the block,
     # and its x and y position
     def __init__(self):
         # Call the parent class (Sprite) constructor
         pygame.sprite.Sprite.__init__(self)
+        # set while an EnemySystem moves the enemy
+        self.system = None
 
-    def update(self):
+    def reset(self, speed):
         pass
 
+    def kill(self):
+        if self.system is not None:
+            self.system.remove(self)
+        pygame.sprite.Sprite.kill(self)
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class EnemySystem:
+    """
+    Holds the kinematics and animation position of every enemy on the field in arrays and
+    advances them all in one batched step per tick: each enemy walks left by its speed,
+    wobbles up and down by its JITTER and plays its strip. Rects are written back for every
+    enemy, as they are hit-tested, but the animation frame only for those on screen.
+    """
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.sprites = []
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        n = self.count
+        arrays = dict(x=np.zeros(capacity), y=np.zeros(capacity), speed=np.zeros(capacity),
+                      jitter=np.zeros(capacity), width=np.zeros(capacity),
+                      frame=np.zeros(capacity, dtype=int), tick=np.zeros(capacity, dtype=int),
+                      ticks_per_frame=np.ones(capacity, dtype=int), frame_count=np.ones(capacity, dtype=int))
+        for name, array in arrays.items():
+            if n:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+
+    def add(self, enemy):
+        if self.count == len(self.x):
+            self.allocate(2 * len(self.x))
+        i = self.count
+        strips = enemy.strips
+        self.x[i] = enemy.x
+        self.y[i] = getattr(enemy, 'y', enemy.rect.y)
+        self.speed[i] = enemy.speed
+        self.jitter[i] = enemy.JITTER
+        self.width[i] = enemy.rect.width
+        # carry on from wherever the enemy's own animation got to
+        self.frame_count[i] = len(strips.images)
+        self.frame[i] = strips.i % len(strips.images)
+        self.tick[i] = strips.f
+        self.ticks_per_frame[i] = strips.frames
+        enemy.slot = i
+        enemy.system = self
+        self.sprites.append(enemy)
+        self.count += 1
+
+    def remove(self, enemy):
+        """drop enemy, moving the last one into its slot"""
+        i, last = enemy.slot, self.count - 1
+        enemy.x = self.x[i]
+        enemy.y = self.y[i]
+        enemy.strips.i = int(self.frame[i])
+        enemy.strips.f = int(self.tick[i])
+        enemy.system = None
+        if i != last:
+            for array in (self.x, self.y, self.speed, self.jitter, self.width, self.frame, self.tick,
+                          self.ticks_per_frame, self.frame_count):
+                array[i] = array[last]
+            moved = self.sprites[last]
+            self.sprites[i] = moved
+            moved.slot = i
+        self.sprites.pop()
+        self.count = last
+
+    def step(self, screen_width):
+        n = self.count
+        if not n:
+            return
+        x, y = self.x[:n], self.y[:n]
+        x -= self.speed[:n]
+        y += np.random.standard_normal(n) * self.jitter[:n]
+
+        # SpriteStripAnim.next(): show the current frame, then count down to the next one
+        shown = self.frame[:n].copy()
+        tick = self.tick[:n]
+        tick -= 1
+        advance = tick == 0
+        self.frame[:n][advance] = (shown[advance] + 1) % self.frame_count[:n][advance]
+        tick[advance] = self.ticks_per_frame[:n][advance]
+
+        visible = ((x > -self.width[:n]) & (x < screen_width)).tolist()
+        for enemy, ix, iy, frame, drawn in zip(self.sprites, x.astype(int).tolist(), y.astype(int).tolist(),
+                                                shown.tolist(), visible):
+            enemy.rect.topleft = ix, iy
+            if drawn:
+                enemy.image = enemy.strips.images[frame]
+
 
 class Zombie(Enemy):
 
@@ -296,33 +624,31 @@ class Zombie(Enemy):
 
         # Create an image of the block, and fill it with a color.
         # This could also be an image loaded from the disk.
-        self.strips = utilities.SpriteStripAnim('zombie.png', (0,0,256,256), (6, 1), colorkey=-1, frames=6, loop=True)
+        self.strips = utilities.SpriteStripAnim('zombie.png', (0,0,256,256), (6, 1), colorkey=-1, frames=6, loop=True, size=(30, 30))
+
+        # Fetch the rectangle object that has the dimensions of the image
+        self.rect = self.strips.images[0].get_rect()
+        self.reset(speed)
+
+    def reset(self, speed):
         self.strips.iter()
         self.image = self.strips.next()
-        self.image = pygame.transform.scale(self.image, (30, 30))
 
-        # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
-        self.rect = self.image.get_rect()
-
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = utilities.screen_size()
 
         self.rect.x = screenWidth
-        self.rect.y = screenHeight - height
+        self.rect.y = screenHeight - self.rect.height
 
         self.speed = speed
         self.x = float(self.rect.x)
-
-    def update(self):
-        self.x -= self.speed
-        self.rect.x = int(self.x)
-        self.image = self.strips.next()
-        self.image = pygame.transform.scale(self.image, (30, 30))
+        self.y = float(self.rect.y)
 
 
 
 class Bat(Enemy):
+    JITTER = 1
+
     # Constructor. Pass in the color of the block,
     # and its x and y position
     def __init__(self, speed):
@@ -332,12 +658,13 @@ class Bat(Enemy):
         # Create an image of the block, and fill it with a color.
         # This could also be an image loaded from the disk.
         self.strips = utilities.SpriteStripAnim('bat.png', (0, 128 - 32, 32, 32), (4, 1), colorkey=-1, frames=3, loop=True)
+        self.reset(speed)
+
+    def reset(self, speed):
         self.strips.iter()
         self.image = self.strips.next()
 
-
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = utilities.screen_size()
 
         # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
@@ -347,13 +674,6 @@ class Bat(Enemy):
         self.x = float(self.rect.x)
         self.y = float(self.rect.y)
 
-    def update(self):
-        self.x -= self.speed
-        self.y += random.normalvariate(0, 1)
-        self.rect.x = int(self.x)
-        self.rect.y = int(self.y)
-        self.image = self.strips.next()
-
 
 class Runner(Enemy):
 
@@ -368,55 +688,64 @@ class Runner(Enemy):
 
         # Create an image of the block, and fill it with a color.
         # This could also be an image loaded from the disk.
-        self.strips = utilities.SpriteStripAnim('runner.png', (0,0,300,300), (6, 1), colorkey=-1, frames=12, loop=True)
+        self.strips = utilities.SpriteStripAnim('runner.png', (0,0,300,300), (6, 1), colorkey=-1, frames=12, loop=True, size=(30, 30))
+
+        # Fetch the rectangle object that has the dimensions of the image
+        self.rect = self.strips.images[0].get_rect()
+        self.reset(speed)
+
+    def reset(self, speed):
         self.strips.iter()
         self.image = self.strips.next()
-        self.image = pygame.transform.scale(self.image, (30, 30))
 
-        # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
-        self.rect = self.image.get_rect()
-
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = utilities.screen_size()
 
         self.rect.x = screenWidth
-        self.rect.y = screenHeight - height
+        self.rect.y = screenHeight - self.rect.height
 
         self.speed = speed
         self.x = float(self.rect.x)
-
-    def update(self):
-        self.x -= self.speed
-        self.rect.x = int(self.x)
-        self.image = self.strips.next()
-        self.image = pygame.transform.scale(self.image, (30, 30))
+        self.y = float(self.rect.y)
 
 
 class Balloon(pygame.sprite.Sprite):
+    # set while the balloon is handed out by a utilities.Pool
+    pool = None
 
     def __init__(self, pos, color):
         # Call the parent class (Sprite) constructor
         pygame.sprite.Sprite.__init__(self)
         self.pop_sound = utilities.load_sound('balloon_pop.wav')
+        self.color = None
+        self.reset(pos, color)
+
+    def reset(self, pos, color):
+        # a pooled balloon only needs a new image if it comes back in another color
+        if color != self.color:
+            # Create an image of the block, and fill it with a color.
+            # This could also be an image loaded from the disk.
+            if color == colors.DARK_GREEN:
+                self.image = utilities.load_image('green_balloon.png')
+            elif color == colors.DARK_BLUE:
+                self.image = utilities.load_image('blue_balloon.png')
+            elif color == colors.DARK_RED:
+                self.image = utilities.load_image('red_balloon.png')
+            self.image = pygame.transform.scale(self.image, (10, 20))
+            self.color = color
+
+            # Fetch the rectangle object that has the dimensions of the image
+            self.rect = self.image.get_rect()
 
-        # Create an image of the block, and fill it with a color.
-        # This could also be an image loaded from the disk.
-        if color == colors.DARK_GREEN:
-            self.image = utilities.load_image('green_balloon.png')
-        elif color == colors.DARK_BLUE:
-            self.image = utilities.load_image('blue_balloon.png')
-        elif color == colors.DARK_RED:
-            self.image = utilities.load_image('red_balloon.png')
-        self.image = pygame.transform.scale(self.image, (10, 20))
-        self.color = color
-
-        # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
-        self.rect = self.image.get_rect()
         self.rect.center = pos
         self.y = self.rect.y
 
+    def kill(self):
+        pygame.sprite.Sprite.kill(self)
+        if self.pool is not None:
+            self.pool.release(self)
+
     def update(self):
         # move upwards
         self.y += random.normalvariate(-1, 0.5)
@@ -427,4 +756,66 @@ class Balloon(pygame.sprite.Sprite):
 
 
     def pop(self):
-        pygame.mixer.Sound.play(self.pop_sound)
+        self.pop_sound.play()
+
+
+# Released sprites are kept here for reuse, so heavy fire and big waves don't
+# rebuild surfaces and strips for every shot and spawn. Capacities bound how
+# many released sprites of each type are kept around.
+pools = {Cannonball: utilities.Pool(Cannonball, 16),
+         Bomb: utilities.Pool(Bomb, 4),
+         Bullet: utilities.Pool(Bullet, 64),
+         Laser: utilities.Pool(Laser, 4),
+         Zombie: utilities.Pool(Zombie, 128),
+         Bat: utilities.Pool(Bat, 32),
+         Runner: utilities.Pool(Runner, 32),
+         Balloon: utilities.Pool(Balloon, 16)}
+
+
+def acquire(cls, *args):
+    """a cls built from args, reusing a released one if there is one"""
+    return pools[cls].acquire(*args)
+
+
+def pool_stats():
+    return dict((cls.__name__, pool.stats()) for cls, pool in pools.items())
+
+
+def reset_pool_stats():
+    for pool in pools.values():
+        pool.reset_stats()
+
+
+class Backlog:
+    """
+    Enemies waiting to come on, kept as [class, speed, count] runs rather than as sprites:
+    pop() only acquires the sprite once the enemy enters the field, so a backlog that
+    doubles with every kill costs a few bytes per kill instead of two sprites.
+    """
+
+    def __init__(self):
+        self.runs = collections.deque()
+        self.size = 0
+
+    def push(self, cls, speed, count=1):
+        if self.runs and self.runs[-1][0] is cls and self.runs[-1][1] == speed:
+            self.runs[-1][2] += count
+        else:
+            self.runs.append([cls, speed, count])
+        self.size += count
+
+    def pop(self):
+        run = self.runs[0]
+        run[2] -= 1
+        if not run[2]:
+            self.runs.popleft()
+        self.size -= 1
+        return acquire(run[0], run[1])
+
+    def nbytes(self):
+        """roughly how much memory the backlog takes up (the classes are shared, so not counted)"""
+        return sys.getsizeof(self.runs) + sum(sys.getsizeof(run) + sys.getsizeof(run[1]) + sys.getsizeof(run[2])
+                                              for run in self.runs)
+
+    def __len__(self):
+        return self.size
@@ -1,8 +1,156 @@
 import pygame
 import os
+import heapq
+from collections import OrderedDict
 from pygame.locals import *
 
+
+class AssetCache(object):
+    """keyed store for loaded assets
+
+    Entries are looked up by key and only built (via the loader passed to
+    get()) on a miss. When max_size is set, the least recently used entry
+    is evicted once the cache grows past it.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        try:
+            item = self.items.pop(key)
+            self.hits += 1
+        except KeyError:
+            item = loader()
+            self.misses += 1
+        # (re)insert as the most recently used entry
+        self.items[key] = item
+        self.trim()
+        return item
+
+    def trim(self):
+        if self.max_size is None:
+            return
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+    def evict(self, match=None):
+        """evict every entry, or only those for which match(key) is True"""
+        if match is None:
+            self.items.clear()
+            return
+        for key in [k for k in self.items if match(k)]:
+            del self.items[key]
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Pool(object):
+    """free list of reusable objects of one type
+
+    acquire(*args) hands out a released object after calling its
+    reset(*args), or builds a new one with factory(*args) when none is free
+    (a miss). Up to capacity released objects are kept for reuse, the rest
+    are left to the garbage collector. Releasing an object twice, or one
+    the pool didn't hand out, does nothing.
+    """
+
+    def __init__(self, factory, capacity):
+        self.factory = factory
+        self.capacity = capacity
+        self.free = []
+        self.live = 0
+        self.high_water = 0
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def acquire(self, *args):
+        if self.free:
+            item = self.free.pop()
+            item.reset(*args)
+            self.hits += 1
+        else:
+            item = self.factory(*args)
+            self.misses += 1
+        item.pool = self
+        self.live += 1
+        self.high_water = max(self.high_water, self.live)
+        return item
+
+    def release(self, item):
+        if getattr(item, 'pool', None) is not self:
+            return
+        item.pool = None
+        self.live -= 1
+        if len(self.free) < self.capacity:
+            self.free.append(item)
+        else:
+            self.dropped += 1
+
+    def reset_stats(self):
+        """start counting afresh, keeping the free objects and what is live"""
+        self.high_water = self.live
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def stats(self):
+        return {'live': self.live, 'free': len(self.free), 'high_water': self.high_water,
+                'hits': self.hits, 'misses': self.misses, 'dropped': self.dropped}
+
+
+# Screen size to simulate when running without a display, see set_headless.
+headless = None
+
+
+def set_headless(size=(320, 240)):
+    """run the game logic without a display, mixer or image decoding
+
+    Images and sprite strips load as blank surfaces of the right size,
+    sounds are silent and screen_size() reports size. Pass None to go back
+    to normal loading.
+    """
+    global headless
+    headless = size
+    # anything cached so far was loaded for the other mode
+    assets.evict()
+    text_cache.evict()
+
+
+def screen_size():
+    if headless:
+        return headless
+    info = pygame.display.Info()
+    return info.current_w, info.current_h
+
+
+# Process-wide cache behind load_image and load_sound. Surfaces handed out
+# are shared between callers, so copy one before drawing on it.
+assets = AssetCache()
+
+
+def _colorkey_key(colorkey):
+    if colorkey is None or colorkey == -1:
+        return colorkey
+    return tuple(colorkey)
+
+
 def load_image(name, colorkey=None):
+    key = ('image', name, _colorkey_key(colorkey))
+    return assets.get(key, lambda: _load_image(name, colorkey))
+
+
+def _load_image(name, colorkey=None):
+    if headless:
+        return pygame.Surface((1, 1))
     fullname = os.path.join('resources', name)
     try:
         image = pygame.image.load(fullname)
@@ -18,9 +166,13 @@ def load_image(name, colorkey=None):
 
 
 def load_sound(name):
+    return assets.get(('sound', name), lambda: _load_sound(name))
+
+
+def _load_sound(name):
     class NoneSound:
         def play(self): pass
-    if not pygame.mixer:
+    if not pygame.mixer or headless:
         return NoneSound()
     fullname = os.path.join('resources', name)
     try:
@@ -31,6 +183,160 @@ def load_sound(name):
     return sound
 
 
+def load_font(name, size):
+    # nothing gets rendered headless, so there's no font to open
+    if headless:
+        return None
+    return assets.get(('font', name, size), lambda: pygame.font.Font(name, size))
+
+
+# Rendered strings change often (score, ammo), so they get their own
+# bounded cache rather than filling up the asset cache.
+text_cache = AssetCache(max_size=256)
+
+
+def render_text(font, text, color, antialias=True):
+    """rasterize text, reusing the last surface while the string is unchanged
+
+    font should come from load_font, so that every user of the same face
+    and size shares cache entries. The returned surface is shared.
+    """
+    key = (font, text, tuple(color), antialias)
+    return text_cache.get(key, lambda: font.render(text, antialias, color))
+
+
+def preload(images=(), sounds=()):
+    """load assets ahead of time so the first use doesn't hit the disk
+
+    images may hold plain names or (name, colorkey) pairs.
+    """
+    for image in images:
+        if isinstance(image, tuple):
+            load_image(*image)
+        else:
+            load_image(image)
+    for sound in sounds:
+        load_sound(sound)
+
+
+def load_strip(name, rect, count, colorkey=None, size=None):
+    """slice (and scale to size, if given) a sprite strip once and share the frames
+
+    The arguments are those of spritesheet.load_strip, plus an optional
+    target size every frame is scaled to. The frames come back as a tuple
+    that every caller shares.
+    """
+    key = ('strip', name, tuple(rect), tuple(count), _colorkey_key(colorkey), size and tuple(size))
+    return assets.get(key, lambda: _load_strip(name, rect, count, colorkey, size))
+
+
+def _load_strip(name, rect, count, colorkey=None, size=None):
+    if headless:
+        blank = pygame.Surface(size or rect[2:4])
+        return (blank,) * (count[0] * count[1])
+    ss = spritesheet(os.path.join('resources', name))
+    images = ss.load_strip(rect, count, colorkey)
+    if size is not None:
+        images = [pygame.transform.scale(image, size) for image in images]
+    return tuple(images)
+
+
+def merge_rects(rects):
+    """union overlapping rects until none of the results overlap"""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+def evict(name=None):
+    """drop cached assets loaded from name, or everything if name is None"""
+    if name is None:
+        assets.evict()
+    else:
+        assets.evict(lambda key: key[1] == name)
+
+
+class SimulationClock(object):
+    """fixed-timestep clock for the game logic
+
+    run_game feeds the real time each frame took into advance(), which
+    returns how many steps of length step the simulation should take to
+    catch up; each tick() then moves simulation time forward one step.
+    When more than max_steps steps are owed, the rest are dropped so a
+    long stall slows the game down instead of freezing it.
+    """
+
+    def __init__(self, step=1.0/60, max_steps=5):
+        self.step = step
+        self.max_steps = max_steps
+        self.time = 0.0
+        self.ticks = 0
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    def tick(self):
+        self.time += self.step
+        self.ticks += 1
+
+
+# The clock run_game steps the scenes with. Game logic reads the time from
+# it through now() rather than from time.time().
+sim_clock = SimulationClock()
+
+
+def now():
+    """current simulation time, in seconds"""
+    return sim_clock.time
+
+
+class Scheduler(object):
+    """timed events kept in a heap
+
+    Events are anything the owner wants to act on at a given time. Each
+    tick the owner takes the events that have come due() and schedules
+    the next ones, so only the earliest event is ever looked at. Events
+    due at the same time come out in the order they were scheduled.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.count = 0
+
+    def schedule(self, time, event):
+        # count breaks ties so events never get compared
+        heapq.heappush(self.events, (time, self.count, event))
+        self.count += 1
+
+    def due(self, time):
+        """remove and return the events scheduled before time, earliest first"""
+        events = []
+        while self.events and self.events[0][0] < time:
+            events.append(heapq.heappop(self.events))
+        return [(when, event) for when, count, event in events]
+
+    def upcoming(self):
+        """(time, event) for every scheduled event, earliest first"""
+        return [(when, event) for when, count, event in sorted(self.events)]
+
+    def __len__(self):
+        return len(self.events)
+
+
 class spritesheet(object):
     def __init__(self, filename):
         try:
@@ -72,11 +378,13 @@ class SpriteStripAnim(object):
     strip wraps to the next row.
     """
 
-    def __init__(self, filename, rect, count, colorkey=None, loop=False, frames=1):
+    def __init__(self, filename, rect, count, colorkey=None, loop=False, frames=1, size=None):
         """construct a SpriteStripAnim
 
         filename, rect, count, and colorkey are the same arguments used
-        by spritesheet.load_strip.
+        by spritesheet.load_strip. size, when given, is the size every
+        frame is scaled to. The frames come from load_strip, so animations
+        of the same strip share them and only keep their own position.
 
         loop is a boolean that, when True, causes the next() method to
         loop. If False, the terminal case raises StopIteration.
@@ -85,8 +393,7 @@ class SpriteStripAnim(object):
         the iterator advances to the next image.
         """
         self.filename = os.path.join('resources', filename)
-        ss = spritesheet(self.filename)
-        self.images = ss.load_strip(rect, count, colorkey)
+        self.images = load_strip(filename, rect, count, colorkey, size)
         self.i = 0
         self.loop = loop
         self.frames = frames
@@ -111,5 +418,6 @@ class SpriteStripAnim(object):
         return image
 
     def __add__(self, ss):
-        self.images.extend(ss.images)
-        return self
\ No newline at end of file
+        # the frames are shared, so join into a new list rather than extending
+        self.images = list(self.images) + list(ss.images)
+        return self